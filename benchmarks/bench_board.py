@@ -0,0 +1,176 @@
+"""Benchmark the board reports on synthetic boards, without KiCad.
+
+    python benchmarks/bench_board.py [footprints ...] [--repeat N]
+
+Every step runs on boards of 100 to 50000 footprints by default and the
+best time of --repeat runs is printed, in ms, one column per board size.
+The board file steps index the file from scratch every run. The BOM step
+is skipped when xlsxwriter is missing, the NumPy placement when NumPy is.
+"""
+
+import os
+import time
+import logging
+import argparse
+import tempfile
+
+import synthetic
+
+pcbnew = synthetic.use_fake_pcbnew()
+
+from plugins import board as board_module  # noqa: E402
+from plugins import placement  # noqa: E402
+from plugins.process import ProcessManager  # noqa: E402
+
+defaultSizes = [100, 1000, 10000, 50000]
+
+
+def collect_footprints(manager, output_dir):
+    manager.footprints = None
+    manager.collect_footprints()
+
+
+def build_bom(manager, output_dir):
+    manager.build_bom()
+
+
+def generate_positions(manager, output_dir):
+    manager.components = []
+    manager.generate_positions(output_dir)
+
+
+def filter_placements(manager, output_dir):
+    """The designator checks of generate_positions, on its placements."""
+    placed = [component["Designator"] for component in manager.components]
+    [
+        designator
+        for designator in placed
+        if "**" not in designator and manager.bom_index.is_placed(designator)
+    ]
+    manager.bom_index.missing_from_bom(placed)
+    manager.bom_index.without_placement(placed)
+
+
+def placement_inputs(manager):
+    """The inputs generate_positions passes to placement.place."""
+    placed = [footprint for footprint in manager.footprints if footprint.in_pos]
+    return (
+        [footprint.x for footprint in placed],
+        [footprint.y for footprint in placed],
+        [footprint.orientation for footprint in placed],
+        [footprint.rotation_offset for footprint in placed],
+        [footprint.position_offset[0] for footprint in placed],
+        [footprint.position_offset[1] for footprint in placed],
+        [footprint.layer == "bottom" for footprint in placed],
+    )
+
+
+def place_numpy(manager, output_dir, inputs):
+    placement.place_numpy(placement.load_numpy(), *inputs)
+
+
+def place_python(manager, output_dir, inputs):
+    placement.place_python(*inputs)
+
+
+def generate_bom(manager, output_dir):
+    manager.generate_bom(output_dir, "synthetic")
+
+
+def parse_sexp(manager, output_dir):
+    with open(manager.board.GetFileName(), "rb") as f:
+        manager.parse_sexp(f.read())
+
+
+def get_stackup_info(manager, output_dir):
+    board_module._cache.clear()
+    manager.get_stackup_info(manager.board.GetFileName())
+
+
+def get_revision(manager, output_dir):
+    board_module._cache.clear()
+    manager.get_revision(manager.board.GetFileName())
+
+
+steps = [
+    ("collect_footprints", collect_footprints),
+    ("build_bom", build_bom),
+    ("generate_positions", generate_positions),
+    ("placement filtering", filter_placements),
+    ("place (numpy)", place_numpy),
+    ("place (python)", place_python),
+    ("generate_bom", generate_bom),
+    ("parse_sexp", parse_sexp),
+    ("get_stackup_info", get_stackup_info),
+    ("get_revision", get_revision),
+]
+
+
+def has_excel_writer():
+    try:
+        import xlsxwriter  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def best_of(step, manager, output_dir, repeat, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        step(manager, output_dir, *args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=defaultSizes)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    excel = has_excel_writer()
+    logger = logging.getLogger("bench_board")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    results = {}
+    file_sizes = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            board = synthetic.make_board(size, directory)
+            file_sizes.append(os.path.getsize(board.GetFileName()))
+            pcbnew.SetBoard(board)
+            manager = ProcessManager(logger, board)
+            output_dir = os.path.join(directory, "output_%d" % size)
+            os.makedirs(output_dir)
+            for name, step in steps:
+                if (step is generate_bom and not excel) or (
+                    step is place_numpy and placement.load_numpy() is None
+                ):
+                    results[name, size] = None
+                    continue
+                step_args = ()
+                if step in (place_numpy, place_python):
+                    step_args = (placement_inputs(manager),)
+                results[name, size] = best_of(
+                    step, manager, output_dir, args.repeat, *step_args
+                )
+
+    header = "%-22s" % "ms" + "".join("%12d" % size for size in args.sizes)
+    print(header)
+    print(
+        "%-22s" % "board file MB"
+        + "".join("%12.2f" % (size / 1e6) for size in file_sizes)
+    )
+    for name, _ in steps:
+        row = "%-22s" % name
+        for size in args.sizes:
+            elapsed = results[name, size]
+            row += "%12s" % ("-" if elapsed is None else "%.2f" % (elapsed * 1000))
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark the Gerber layer fingerprints and check what changes them.
+
+    python benchmarks/bench_fingerprint.py [footprints ...] [--repeat N]
+
+Prints the best time of --repeat runs of layer_fingerprints over the layers
+of plotPlan, per board size. On every board an item is then added to one
+layer at a time, and the script exits with status 1 when a fingerprint
+that should have changed did not, or one that should not did: the cached
+Gerber file of that layer would be restored stale, or plotted for nothing.
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+
+import synthetic
+
+pcbnew = synthetic.use_fake_pcbnew()
+
+from plugins.config import plotPlan  # noqa: E402
+from plugins.fingerprint import layer_fingerprints  # noqa: E402
+
+defaultSizes = [100, 1000, 10000]
+
+# (file layer added to, layers whose fingerprint must change)
+edits = [
+    ("F.Cu", {pcbnew.F_Cu}),
+    ("F.Mask", {pcbnew.F_Mask, pcbnew.F_SilkS}),
+    ("B.Mask", {pcbnew.B_Mask, pcbnew.B_SilkS}),
+    ("F.SilkS", {pcbnew.F_SilkS}),
+    ("B.SilkS", {pcbnew.B_SilkS}),
+]
+
+
+def add_item(board, layer):
+    """Return a copy of board with a rectangle on the file layer named layer."""
+    item = '\t(gr_rect\n\t\t(start 10 10)\n\t\t(end 20 20)\n\t\t(layer "%s")\n\t)\n'
+    end = board.text.rindex(")")
+    text = board.text[:end] + item % layer + board.text[end:]
+    return pcbnew.BOARD(board.file_name, board.footprints, text=text)
+
+
+def check_edits(board, layers):
+    """Return the problems found adding an item to each layer of edits."""
+    before = layer_fingerprints(board, layers)
+    problems = []
+    for layer, expected in edits:
+        after = layer_fingerprints(add_item(board, layer), layers)
+        changed = {
+            layer_id for layer_id in layers if after[layer_id] != before[layer_id]
+        }
+        for layer_id in expected - changed:
+            problems.append(
+                "%s not changed by an item on %s"
+                % (pcbnew.BOARD.GetStandardLayerName(layer_id), layer)
+            )
+        for layer_id in changed - expected:
+            problems.append(
+                "%s changed by an item on %s"
+                % (pcbnew.BOARD.GetStandardLayerName(layer_id), layer)
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=defaultSizes)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    layers = [layer_info[1] for layer_info in plotPlan]
+    problems = []
+    print("%-10s %10s" % ("footprints", "ms"))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            board = synthetic.make_board(size, directory)
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                layer_fingerprints(board, layers)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print("%-10d %10.2f" % (size, best * 1000))
+            problems += [
+                "%d footprints: %s" % (size, p) for p in check_edits(board, layers)
+            ]
+
+    if problems:
+        print()
+        print("\n".join(problems))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
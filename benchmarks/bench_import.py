@@ -0,0 +1,87 @@
+"""Benchmark what registering the plugin costs the PCB Editor at startup.
+
+    python benchmarks/bench_import.py [--repeat N]
+
+Every run starts a fresh interpreter, on the pcbnew and wx stand-ins of
+fake_pcbnew, that imports pcbnew and wx and then the plugin package, which
+registers the plugin like the PCB Editor does. It prints the best time of
+--repeat runs for both imports and the modules the plugin loaded, and exits
+with status 1 when one of heavyModules is among them: those load on the
+first run of the generator, not at registration.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import synthetic
+
+heavyModules = ["pandas", "numpy", "fitz", "pymupdf", "xlsxwriter", "openpyxl"]
+
+# run in the fresh interpreter, prints the import times and the new modules
+registerScript = """
+import sys, json, time
+start = time.perf_counter()
+import pcbnew, wx
+host = time.perf_counter() - start
+before = set(sys.modules)
+start = time.perf_counter()
+import plugins
+plugin = time.perf_counter() - start
+print(json.dumps({
+    "host": host,
+    "plugin": plugin,
+    "registered": len(pcbnew.ActionPlugin.registered),
+    "modules": sorted(set(sys.modules) - before),
+}))
+"""
+
+
+def register_once():
+    """Import the plugin in a fresh interpreter, return what it measured."""
+    path = [
+        os.path.join(synthetic.benchmarksDir, "fake_pcbnew"),
+        os.path.dirname(synthetic.pluginsDir),
+    ]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path))
+    # registered as in the PCB Editor, where the command line switch is unset
+    env.pop("DOCS_HEADLESS", None)
+    output = subprocess.run(
+        [sys.executable, "-c", registerScript],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [register_once() for _ in range(args.repeat)]
+    if not all(run["registered"] for run in runs):
+        raise SystemExit("the plugin did not register")
+    modules = runs[0]["modules"]
+    print("%-24s %8s" % ("import", "ms"))
+    print("%-24s %8.2f" % ("pcbnew, wx", min(run["host"] for run in runs) * 1000))
+    print("%-24s %8.2f" % ("plugins", min(run["plugin"] for run in runs) * 1000))
+    print()
+    print("modules loaded by the plugin (%d):" % len(modules))
+    print("  " + " ".join(modules))
+
+    heavy = [
+        module for module in modules if module.split(".")[0].lower() in heavyModules
+    ]
+    if heavy:
+        print()
+        print("loaded at registration: " + " ".join(heavy))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Benchmark the assembly drawing steps of plot.py on synthetic layer pdfs.
+
+    python benchmarks/bench_pdf.py [scenario ...] [--repeat N]
+                                   [--save NAME] [--compare NAME]
+
+The layer pdfs look like KiCad's: deflated content streams of filled
+polygons, tracks and arcs drawn in black. Every scenario times
+colorize_pdf (the layers opened and recolored), merge_pdf,
+create_pdf_from_pages with the Job.pdf save, and composite_svg on svg
+layers of the same content. It prints the best time of --repeat runs, the
+throughput over the uncompressed content, the peak resident memory and the
+size of the file written.
+
+--save NAME stores the results in benchmarks/baselines/NAME.json with the
+plugin version, --compare NAME prints the speedup over such a baseline.
+"""
+
+import os
+import json
+import time
+import zlib
+import random
+import argparse
+import platform
+import tempfile
+
+import synthetic
+
+synthetic.use_fake_pcbnew()
+
+from plugins import plot  # noqa: E402
+from plugins.memory import MemoryMonitor  # noqa: E402
+from plugins.svg import composite_svg  # noqa: E402
+
+baselinesDir = os.path.join(synthetic.benchmarksDir, "baselines")
+colors = ["#3FD3F2", "#C83434", "#E0E000", "#F0F0F0", "#28C83C", "#8080FF"]
+pageSize = (842, 595)
+
+# name: (layers, pages per layer, uncompressed MB per page)
+scenarios = {
+    "small": (6, 1, 0.5),
+    "fills": (6, 1, 8),
+    "layers": (24, 1, 1),
+    "pages": (6, 16, 0.5),
+}
+
+
+def make_content(size_mb, rnd):
+    """Return a content stream of KiCad style fills, tracks and arcs."""
+    parts = [b"0 0 0 RG 0 0 0 rg\n1 J 1 j\n"]
+    size = 0
+    width, height = pageSize
+    while size < size_mb * 1000000:
+        kind = rnd.random()
+        x, y = rnd.uniform(0, width), rnd.uniform(0, height)
+        if kind < 0.5:
+            # zone fill, one long polygon
+            points = [
+                b"%.4f %.4f l" % (x + rnd.uniform(-40, 40), y + rnd.uniform(-40, 40))
+                for _ in range(rnd.randint(8, 64))
+            ]
+            part = b"%.4f %.4f m\n%s\nh f\n" % (x, y, b"\n".join(points))
+        elif kind < 0.9:
+            part = b"%.4f w\n%.4f %.4f m %.4f %.4f l S\n" % (
+                rnd.uniform(0.1, 1.5),
+                x,
+                y,
+                x + rnd.uniform(-20, 20),
+                y + rnd.uniform(-20, 20),
+            )
+        else:
+            part = b"%.4f %.4f m %.4f %.4f %.4f %.4f %.4f %.4f c S\n" % tuple(
+                [x, y] + [rnd.uniform(0, 600) for _ in range(6)]
+            )
+        if rnd.random() < 0.01:
+            # KiCad repeats the color when the pen changes
+            part += b"0 0 0 RG 0 0 0 rg\n"
+        parts.append(part)
+        size += len(part)
+    return b"".join(parts)
+
+
+def write_layer_pdf(path, contents):
+    """Write a pdf with one page per deflated content stream."""
+    count = len(contents)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % (3 + 2 * i) for i in range(count)), count),
+    ]
+    for i, content in enumerate(contents):
+        data = zlib.compress(content, 6)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R >>"
+            % (pageSize[0], pageSize[1], 4 + 2 * i)
+        )
+        objects.append(
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data)
+            + data
+            + b"\nendstream"
+        )
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        f.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1))
+        f.write(b"startxref\n%d\n%%%%EOF\n" % xref)
+
+
+def write_layer_svg(path, size, rnd):
+    """Write about size bytes of KiCad style svg fills and tracks."""
+    width, height = pageSize
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            '<svg xmlns="http://www.w3.org/2000/svg" width="297mm" height="210mm"'
+            ' viewBox="0 0 %d %d">\n<title>layer</title>\n' % pageSize
+        )
+        written = 0
+        while written < size:
+            x, y = rnd.uniform(0, width), rnd.uniform(0, height)
+            if rnd.random() < 0.5:
+                points = " ".join(
+                    "%.4f %.4f" % (x + rnd.uniform(-40, 40), y + rnd.uniform(-40, 40))
+                    for _ in range(rnd.randint(8, 64))
+                )
+                shape = (
+                    '<path style="fill:#000000;fill-opacity:1.0;stroke:none"'
+                    ' d="M %.4f %.4f L %s Z"/>\n' % (x, y, points)
+                )
+            else:
+                shape = (
+                    '<path style="fill:none;stroke:#000000;stroke-width:%.4f;'
+                    'stroke-linecap:round" d="M %.4f %.4f L %.4f %.4f"/>\n'
+                    % (rnd.uniform(0.1, 1.5), x, y, x + 10, y + 10)
+                )
+            f.write(shape)
+            written += len(shape)
+        f.write("</svg>\n")
+
+
+def make_layers(directory, name, layers, pages, size_mb):
+    """Write the layer files of a scenario, return their paths and content size."""
+    rnd = random.Random(name)
+    pdf_files = []
+    svg_files = []
+    content_size = 0
+    for layer in range(layers):
+        contents = [make_content(size_mb, rnd) for _ in range(pages)]
+        content_size += sum(len(content) for content in contents)
+        pdf_file = os.path.join(directory, "%s-%d.pdf" % (name, layer))
+        write_layer_pdf(pdf_file, contents)
+        pdf_files.append(pdf_file)
+        svg_file = os.path.join(directory, "%s-%d.svg" % (name, layer))
+        write_layer_svg(svg_file, len(contents[0]), rnd)
+        svg_files.append(svg_file)
+    return pdf_files, svg_files, content_size
+
+
+def run_steps(directory, pdf_files, svg_files):
+    """Run the steps once, return {step: (seconds, output size)} and their memory."""
+    monitor = MemoryMonitor(trace=False)
+    monitor.start()
+    times = {}
+    try:
+        with monitor.measure("colorize_pdf"):
+            start = time.perf_counter()
+            docs = []
+            for i, pdf_file in enumerate(pdf_files):
+                doc = plot.load_fitz().open(pdf_file)
+                plot.colorize_pdf(doc, plot.hex_to_rgb(colors[i % len(colors)]))
+                docs.append(doc)
+            times["colorize_pdf"] = (time.perf_counter() - start, None)
+
+        with monitor.measure("merge_pdf"):
+            start = time.perf_counter()
+            # two templates of the same layers, as Top and Bottom
+            merged = [plot.merge_pdf(docs), plot.merge_pdf(docs[::-1])]
+            times["merge_pdf"] = (time.perf_counter() - start, None)
+        for doc in docs:
+            doc.close()
+
+        job_file = os.path.join(directory, "Job.pdf")
+        with monitor.measure("create_pdf_from_pages"):
+            start = time.perf_counter()
+            with plot.create_pdf_from_pages(merged) as output:
+                output.save(job_file)
+            times["create_pdf_from_pages"] = (
+                time.perf_counter() - start,
+                os.path.getsize(job_file),
+            )
+        for doc in merged:
+            doc.close()
+
+        svg_file = os.path.join(directory, "Job.svg")
+        with monitor.measure("composite_svg"):
+            start = time.perf_counter()
+            composite_svg(
+                [
+                    ("layer%d" % i, path, colors[i % len(colors)])
+                    for i, path in enumerate(svg_files)
+                ],
+                svg_file,
+            )
+            times["composite_svg"] = (
+                time.perf_counter() - start,
+                os.path.getsize(svg_file),
+            )
+    finally:
+        monitor.stop()
+    return times, monitor.summary()
+
+
+def plugin_version():
+    with open(
+        os.path.join(os.path.dirname(synthetic.pluginsDir), "metadata.json")
+    ) as f:
+        return json.load(f)["versions"][-1]["version"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenarios", nargs="*", default=list(scenarios))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", metavar="NAME", help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="NAME", help="compare with a baseline")
+    args = parser.parse_args()
+
+    try:
+        plot.load_fitz()
+    except ImportError:
+        raise SystemExit("PyMuPDF is needed for the pdf benchmarks")
+    baseline = None
+    if args.compare:
+        with open(os.path.join(baselinesDir, args.compare + ".json")) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    print(
+        "%-8s %-22s %10s %9s %10s %10s%s"
+        % (
+            "scenario",
+            "step",
+            "ms",
+            "MB/s",
+            "peak MB",
+            "output MB",
+            " %8s" % "speedup" if baseline else "",
+        )
+    )
+    for name in args.scenarios:
+        layers, pages, size_mb = scenarios[name]
+        with tempfile.TemporaryDirectory() as directory:
+            pdf_files, svg_files, content_size = make_layers(
+                directory, name, layers, pages, size_mb
+            )
+            best = {}
+            memory = None
+            for _ in range(args.repeat):
+                times, summary = run_steps(directory, pdf_files, svg_files)
+                # the first run has the highest peaks, before anything is reused
+                memory = memory or summary
+                for step, (seconds, size) in times.items():
+                    if step not in best or seconds < best[step][0]:
+                        best[step] = (seconds, size)
+
+        results[name] = {}
+        for step, (seconds, size) in best.items():
+            result = {
+                "seconds": round(seconds, 6),
+                "mb_per_s": round(content_size / 1e6 / seconds, 2),
+                "peak_rss_mb": memory[step]["rss_mb"],
+                "output_mb": None if size is None else round(size / 1e6, 3),
+            }
+            results[name][step] = result
+            line = "%-8s %-22s %10.1f %9.1f %10s %10s" % (
+                name,
+                step,
+                seconds * 1000,
+                result["mb_per_s"],
+                result["peak_rss_mb"],
+                "-" if size is None else "%.2f" % result["output_mb"],
+            )
+            previous = (baseline or {}).get(name, {}).get(step)
+            if previous:
+                line += " %7.2fx" % (previous["seconds"] / seconds)
+            print(line)
+
+    if args.save:
+        os.makedirs(baselinesDir, exist_ok=True)
+        with open(os.path.join(baselinesDir, args.save + ".json"), "w") as f:
+            json.dump(
+                {
+                    "plugin_version": plugin_version(),
+                    "pymupdf": plot.load_fitz().VersionBind,
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "scenarios": {name: scenarios[name] for name in results},
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark the content stream recoloring against the former two-pass version.
+
+    python benchmarks/bench_recolor.py [size_mb ...]
+
+The streams are synthetic KiCad-like zone fills: long runs of path
+operators with a black color operator every few thousand segments.
+"""
+
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "plugins"))
+
+from recolor import recolor_stream, color_operands  # noqa: E402
+
+color = (0.24705882352941178, 0.8274509803921568, 0.9490196078431372)
+
+
+def make_stream(size_mb, seed=0):
+    rnd = random.Random(seed)
+    parts = []
+    size = 0
+    i = 0
+    while size < size_mb * 1000000:
+        if i % 2000 == 0:
+            part = b"0 0 0 rg 0 0 0 RG\n%g w\n" % rnd.uniform(0, 1)
+        else:
+            part = b"%g %g m\n%g %g l\n%g %g l\nf\n" % tuple(
+                round(rnd.uniform(0, 300), 4) for _ in range(6)
+            )
+        parts.append(part)
+        size += len(part)
+        i += 1
+    return b"".join(parts)
+
+
+def legacy_recolor(stream_bytes, color):
+    """The recoloring colorize_pdf used before, two passes over the stream."""
+    new_color = color_operands(color).decode("ascii")
+    stream_bytes = re.sub(b"0.0.0.RG", bytes(new_color + "RG", "ascii"), stream_bytes)
+    stream_bytes = re.sub(b"0.0.0.rg", bytes(new_color + "rg", "ascii"), stream_bytes)
+    return stream_bytes
+
+
+def best_of(func, stream, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(stream, color)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [1, 4, 16]
+    print("%8s %12s %12s %8s" % ("MB", "two-pass ms", "one-pass ms", "speedup"))
+    for size_mb in sizes:
+        stream = make_stream(size_mb)
+        legacy_time, legacy_result = best_of(legacy_recolor, stream)
+        new_time, new_result = best_of(recolor_stream, stream)
+        if legacy_result != new_result:
+            raise SystemExit("results differ for %s MB" % size_mb)
+        print(
+            "%8.1f %12.2f %12.2f %7.2fx"
+            % (
+                len(stream) / 1e6,
+                legacy_time * 1000,
+                new_time * 1000,
+                legacy_time / new_time,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""Stand-in for KiCad's pcbnew module, enough to run the plugin without KiCad.
+
+wx.py next to it stands in for wxPython as far as registering the plugin.
+
+Boards are plain objects holding FOOTPRINT objects, see synthetic.py for the
+generators. The plot controller and drill writer write small stub files, so
+the benchmarks time the plugin code rather than KiCad's plotting.
+"""
+
+import os
+
+F_Cu = 0
+In1_Cu = 1
+In2_Cu = 2
+In3_Cu = 3
+In4_Cu = 4
+B_Cu = 31
+B_Adhes = 32
+F_Adhes = 33
+B_Paste = 34
+F_Paste = 35
+B_SilkS = 36
+F_SilkS = 37
+B_Mask = 38
+F_Mask = 39
+Dwgs_User = 40
+Cmts_User = 41
+Eco1_User = 42
+Eco2_User = 43
+Edge_Cuts = 44
+Margin = 45
+B_CrtYd = 46
+F_CrtYd = 47
+B_Fab = 48
+F_Fab = 49
+User_1 = 50
+User_9 = 58
+
+PCBNEW_LAYER_ID_START = 0
+PCB_LAYER_ID_COUNT = 60
+
+layerNames = {
+    F_Cu: "F.Cu",
+    In1_Cu: "In1.Cu",
+    In2_Cu: "In2.Cu",
+    In3_Cu: "In3.Cu",
+    In4_Cu: "In4.Cu",
+    B_Cu: "B.Cu",
+    B_Adhes: "B.Adhesive",
+    F_Adhes: "F.Adhesive",
+    B_Paste: "B.Paste",
+    F_Paste: "F.Paste",
+    B_SilkS: "B.Silkscreen",
+    F_SilkS: "F.Silkscreen",
+    B_Mask: "B.Mask",
+    F_Mask: "F.Mask",
+    Dwgs_User: "User.Drawings",
+    Cmts_User: "User.Comments",
+    Eco1_User: "User.Eco1",
+    Eco2_User: "User.Eco2",
+    Edge_Cuts: "Edge.Cuts",
+    Margin: "Margin",
+    B_CrtYd: "B.Courtyard",
+    F_CrtYd: "F.Courtyard",
+    B_Fab: "B.Fab",
+    F_Fab: "F.Fab",
+}
+layerNames.update({User_1 + i: "User.%d" % (i + 1) for i in range(9)})
+
+FP_THROUGH_HOLE = 1
+FP_SMD = 2
+FP_EXCLUDE_FROM_POS_FILES = 4
+FP_EXCLUDE_FROM_BOM = 8
+FP_DNP = 64
+
+PLOT_FORMAT_GERBER = 1
+PLOT_FORMAT_PDF = 4
+PLOT_FORMAT_SVG = 3
+DRILL_MARKS_NO_DRILL_SHAPE = 0
+DRILL_MARKS_FULL_DRILL_SHAPE = 2
+
+_board = None
+
+
+def Version():
+    return "8.0.0"
+
+
+def FromMM(mm):
+    return int(round(mm * 1000000))
+
+
+def IsCopperLayer(layer):
+    return layer <= B_Cu
+
+
+class VECTOR2I(tuple):
+    def __new__(cls, x, y):
+        return tuple.__new__(cls, (x, y))
+
+    @property
+    def x(self):
+        return self[0]
+
+    @property
+    def y(self):
+        return self[1]
+
+
+class EDA_ANGLE:
+    def __init__(self, degrees):
+        self.degrees = degrees
+
+    def AsDegrees(self):
+        return self.degrees
+
+
+class LIB_ID:
+    def __init__(self, nickname, name):
+        self.nickname = nickname
+        self.name = name
+
+    def GetLibNickname(self):
+        return self.nickname
+
+    def GetLibItemName(self):
+        return self.name
+
+
+class FOOTPRINT:
+    def __init__(
+        self, reference, lib_id, value, layer, position, orientation, attributes, fields
+    ):
+        self.reference = reference
+        self.lib_id = lib_id
+        self.value = value
+        self.layer = layer
+        self.position = position
+        self.orientation = orientation
+        self.attributes = attributes
+        self.fields = fields
+
+    def GetReference(self):
+        return self.reference
+
+    def GetFPID(self):
+        return self.lib_id
+
+    def GetValue(self):
+        return self.value
+
+    def GetLayer(self):
+        return self.layer
+
+    def GetPosition(self):
+        return self.position
+
+    def GetOrientation(self):
+        return EDA_ANGLE(self.orientation)
+
+    def GetAttributes(self):
+        return self.attributes
+
+    def GetFieldText(self, name):
+        return self.fields.get(name, "")
+
+
+class BOX2I:
+    def __init__(self, left, top, right, bottom):
+        self.left, self.top, self.right, self.bottom = left, top, right, bottom
+
+    def GetLeft(self):
+        return self.left
+
+    def GetTop(self):
+        return self.top
+
+    def GetRight(self):
+        return self.right
+
+    def GetBottom(self):
+        return self.bottom
+
+
+class BOARD_DESIGN_SETTINGS:
+    def __init__(self, aux_origin, grid_origin=VECTOR2I(0, 0)):
+        self.aux_origin = aux_origin
+        self.grid_origin = grid_origin
+
+    def GetAuxOrigin(self):
+        return self.aux_origin
+
+    def GetGridOrigin(self):
+        return self.grid_origin
+
+
+class BOARD:
+    def __init__(self, file_name="", footprints=(), copper_layers=2, text=""):
+        self.file_name = file_name
+        self.footprints = list(footprints)
+        self.design_settings = BOARD_DESIGN_SETTINGS(VECTOR2I(0, 0))
+        self.layers = {F_Cu, B_Cu, F_SilkS, B_SilkS, F_Mask, B_Mask}
+        self.layers.update({F_Paste, B_Paste, Edge_Cuts, F_Fab, B_Fab})
+        self.layers.update(range(1, copper_layers - 1))
+        # the board file content, what the kicad_sexpr writer returns
+        self.text = text
+
+    @staticmethod
+    def GetStandardLayerName(layer):
+        return layerNames.get(layer, "")
+
+    def GetFileName(self):
+        return self.file_name
+
+    def GetFootprints(self):
+        return self.footprints
+
+    def GetDesignSettings(self):
+        return self.design_settings
+
+    def IsLayerEnabled(self, layer):
+        return layer in self.layers
+
+    def GetBoardEdgesBoundingBox(self):
+        # the 300 x 200 mm outline of synthetic.board_text
+        return BOX2I(0, 0, FromMM(300), FromMM(200))
+
+
+class ActionPlugin:
+    registered = []
+
+    def register(self):
+        self.defaults()
+        ActionPlugin.registered.append(self)
+
+    def defaults(self):
+        pass
+
+
+def Refresh():
+    pass
+
+
+def GetBoard():
+    return _board
+
+
+def SetBoard(board):
+    """Make board the one open in the editor, not part of pcbnew."""
+    global _board
+    _board = board
+
+
+def LoadBoard(file_name):
+    if not os.path.isfile(file_name):
+        raise IOError("Failed to load board " + file_name)
+    with open(file_name, encoding="utf-8") as f:
+        return BOARD(file_name, text=f.read())
+
+
+class PCB_IO_KICAD_SEXPR:
+    def Format(self, board):
+        self.text = board.text
+
+    def GetStringOutput(self, clear):
+        return self.text
+
+
+class PCB_PLOT_PARAMS:
+    def __init__(self):
+        self.output_directory = ""
+
+    def SetOutputDirectory(self, directory):
+        self.output_directory = directory
+
+    def GetOutputDirectory(self):
+        return self.output_directory
+
+    def __getattr__(self, name):
+        # the Set... options change nothing in the stub files
+        if name.startswith("Set"):
+            return lambda *args: None
+        raise AttributeError(name)
+
+
+class PLOT_CONTROLLER:
+    def __init__(self, board):
+        self.board = board
+        self.options = PCB_PLOT_PARAMS()
+        self.layer = F_Cu
+        self.file_name = None
+        self.format = None
+
+    def GetPlotOptions(self):
+        return self.options
+
+    def SetLayer(self, layer):
+        self.layer = layer
+
+    def OpenPlotfile(self, suffix, plot_format, sheet_desc):
+        extension = {
+            PLOT_FORMAT_GERBER: ".gbr",
+            PLOT_FORMAT_PDF: ".pdf",
+            PLOT_FORMAT_SVG: ".svg",
+        }[plot_format]
+        base = os.path.splitext(os.path.basename(self.board.GetFileName()))[0]
+        directory = self.options.GetOutputDirectory()
+        os.makedirs(directory, exist_ok=True)
+        self.file_name = os.path.join(directory, base + "-" + suffix + extension)
+        self.format = plot_format
+        return True
+
+    def PlotLayer(self):
+        if self.format == PLOT_FORMAT_PDF:
+            with open(self.file_name, "wb") as f:
+                f.write(stub_pdf(self.layer))
+        elif self.format == PLOT_FORMAT_SVG:
+            with open(self.file_name, "w", encoding="utf-8") as f:
+                f.write(
+                    '<svg xmlns="http://www.w3.org/2000/svg">'
+                    '<path style="stroke:#000000" d="M0 0L10 10"/></svg>\n'
+                )
+        else:
+            with open(self.file_name, "w", encoding="ascii") as f:
+                f.write("%%FSLAX46Y46*%%\nG04 layer %d*\nM02*\n" % self.layer)
+        return True
+
+    def GetPlotFileName(self):
+        return self.file_name
+
+    def ClosePlot(self):
+        pass
+
+
+def stub_pdf(layer):
+    """Return a one page pdf with a black square, offset by layer."""
+    content = b"0 0 0 RG 0 0 0 rg %d %d 100 100 re f\n" % (50 + layer, 50 + layer)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"endstream",
+    ]
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    return data + b"startxref\n%d\n%%%%EOF\n" % xref
+
+
+class EXCELLON_WRITER:
+    def __init__(self, board):
+        self.board = board
+
+    def SetOptions(self, *args):
+        pass
+
+    def SetFormat(self, *args):
+        pass
+
+    def SetMapFileFormat(self, *args):
+        pass
+
+    def CreateDrillandMapFilesSet(self, directory, drill, drill_map, *args):
+        base = os.path.splitext(os.path.basename(self.board.GetFileName()))[0]
+        with open(os.path.join(directory, base + ".drl"), "w") as f:
+            f.write("M48\nMETRIC\n%\nM30\n")
+        return True
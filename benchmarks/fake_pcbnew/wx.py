@@ -0,0 +1,30 @@
+"""Stand-in for the parts of wxPython the plugin touches when it registers."""
+
+_last_id = 1000
+
+
+def NewId():
+    global _last_id
+    _last_id += 1
+    return _last_id
+
+
+def MessageBox(message, caption="Message", *args):
+    raise RuntimeError(message)
+
+
+def PostEvent(window, event):
+    pass
+
+
+class PyEvent:
+    def SetEventType(self, event_type):
+        self.event_type = event_type
+
+
+class Frame:
+    pass
+
+
+class Dialog(Frame):
+    pass
@@ -0,0 +1,203 @@
+"""Synthetic boards for the benchmarks, on the pcbnew stand-in of fake_pcbnew.
+
+    import synthetic
+    pcbnew = synthetic.use_fake_pcbnew()
+    board = synthetic.make_board(10000, directory)
+
+make_board returns a pcbnew.BOARD holding count footprints and writes the
+matching .kicad_pcb file, footprints and pads included, so that the code
+reading the board file scales with it too. The same count and seed always
+give the same board.
+"""
+
+import os
+import sys
+import zlib
+import types
+import random
+
+benchmarksDir = os.path.dirname(os.path.abspath(__file__))
+pluginsDir = os.path.join(os.path.dirname(benchmarksDir), "plugins")
+
+# (prefix, library, footprint, values, share of the footprints)
+partKinds = [
+    ("R", "Resistor_SMD", "R_0603_1608Metric", ["10k", "4k7", "100R", "1M"], 0.35),
+    ("C", "Capacitor_SMD", "C_0402_1005Metric", ["100n", "1u", "10u"], 0.35),
+    ("L", "Inductor_SMD", "L_0805_2012Metric", ["2u2", "10u"], 0.04),
+    ("D", "LED_SMD", "LED_0603_1608Metric", ["red", "green"], 0.06),
+    ("Q", "Package_TO_SOT_SMD", "SOT-23", ["BSS138", "MMBT3904"], 0.08),
+    ("U", "Package_DFN_QFN", "QFN-32-1EP_5x5mm_P0.5mm", ["STM32G0", "ESP32"], 0.08),
+    ("J", "Connector_PinHeader_2.54mm", "PinHeader_1x04_P2.54mm", ["CONN"], 0.04),
+]
+padCounts = {"R": 2, "C": 2, "L": 2, "D": 2, "Q": 3, "U": 33, "J": 4}
+
+
+def use_fake_pcbnew():
+    """Import the stand-in as pcbnew and the plugin package without wx.
+
+    The package __init__ registers the plugin in the PCB Editor, the
+    benchmarks only need its modules.
+    """
+    sys.path.insert(0, os.path.join(benchmarksDir, "fake_pcbnew"))
+    import pcbnew
+
+    if "plugins" not in sys.modules:
+        package = types.ModuleType("plugins")
+        package.__path__ = [pluginsDir]
+        sys.modules["plugins"] = package
+    return pcbnew
+
+
+def make_footprints(count, seed=0):
+    """Return count footprints with the fields of a typical JLCPCB assembly."""
+    import pcbnew
+
+    rnd = random.Random(seed)
+    weights = [kind[4] for kind in partKinds]
+    numbers = {}
+    footprints = []
+    for i in range(count):
+        prefix, library, name, values, _ = rnd.choices(partKinds, weights)[0]
+        numbers[prefix] = numbers.get(prefix, 0) + 1
+        reference = prefix + str(numbers[prefix])
+        if rnd.random() < 0.002:
+            # a symbol never annotated
+            reference = prefix + "**"
+        value = rnd.choice(values)
+        fields = {"Mfr_Part_Number": "", "LCSC_Part": "", "Unit price": ""}
+        if rnd.random() < 0.8:
+            fields["Mfr_Part_Number"] = "%s-%s-%s" % (name.split("_")[0], value, prefix)
+            fields["Mfr_Name"] = rnd.choice(["Yageo", "Murata", "TI", "ST"])
+            fields["LCSC_Part"] = "C%d" % (
+                zlib.crc32(fields["Mfr_Part_Number"].encode()) % 10**6
+            )
+            fields["Unit price"] = "%.4f" % rnd.uniform(0.001, 2.0)
+        if rnd.random() < 0.05:
+            fields["JLCPCB Rotation Offset"] = rnd.choice(["90", "180", "-90"])
+        if rnd.random() < 0.02:
+            fields["JLCPCB Position Offset"] = "0.1,-0.25"
+
+        attributes = pcbnew.FP_THROUGH_HOLE if prefix == "J" else pcbnew.FP_SMD
+        roll = rnd.random()
+        if roll < 0.01:
+            attributes |= pcbnew.FP_EXCLUDE_FROM_POS_FILES
+        elif roll < 0.02:
+            attributes |= pcbnew.FP_EXCLUDE_FROM_BOM
+        elif roll < 0.03:
+            attributes |= pcbnew.FP_DNP
+
+        footprints.append(
+            pcbnew.FOOTPRINT(
+                reference,
+                pcbnew.LIB_ID(library, name),
+                value,
+                pcbnew.F_Cu if rnd.random() < 0.7 else pcbnew.B_Cu,
+                pcbnew.VECTOR2I(rnd.randint(0, 300000000), rnd.randint(0, 200000000)),
+                rnd.choice([0.0, 90.0, 180.0, 270.0, 45.0]),
+                attributes,
+                fields,
+            )
+        )
+    return footprints
+
+
+def board_text(footprints, copper_layers=4, revision="3"):
+    """Return the .kicad_pcb content of footprints, as KiCad 8 writes it."""
+    import pcbnew
+
+    copper = ["F.Cu"] + ["In%d.Cu" % i for i in range(1, copper_layers - 1)]
+    copper.append("B.Cu")
+    lines = [
+        "(kicad_pcb",
+        "\t(version 20240108)",
+        '\t(generator "pcbnew")',
+        '\t(generator_version "8.0")',
+        "\t(general",
+        "\t\t(thickness 1.6)",
+        "\t\t(legacy_teardrops no)",
+        "\t)",
+        '\t(paper "A4")',
+        "\t(title_block",
+        '\t\t(title "Synthetic board")',
+        '\t\t(rev "%s")' % revision,
+        '\t\t(company "Benchmarks")',
+        "\t)",
+        "\t(layers",
+    ]
+    for number, name in enumerate(copper):
+        number = 31 if name == "B.Cu" else number
+        lines.append('\t\t(%d "%s" signal)' % (number, name))
+    lines.append("\t)")
+    lines += ["\t(setup", "\t\t(stackup"]
+    lines += [
+        '\t\t\t(layer "F.SilkS"\n\t\t\t\t(type "Top Silk Screen")\n\t\t\t)',
+        '\t\t\t(layer "F.Mask"\n\t\t\t\t(type "Top Solder Mask")'
+        '\n\t\t\t\t(color "Green")\n\t\t\t\t(thickness 0.01)\n\t\t\t)',
+    ]
+    for number, name in enumerate(copper):
+        lines.append(
+            '\t\t\t(layer "%s"\n\t\t\t\t(type "copper")\n\t\t\t\t(thickness 0.035)\n\t\t\t)'
+            % name
+        )
+        if number < len(copper) - 1:
+            lines.append(
+                '\t\t\t(layer "dielectric %d"\n\t\t\t\t(type "%s")'
+                '\n\t\t\t\t(thickness %.4f)\n\t\t\t\t(material "FR4")\n\t\t\t)'
+                % (number + 1, "core" if number % 2 else "prepreg", 1.5 / copper_layers)
+            )
+    lines += [
+        '\t\t\t(layer "B.Mask"\n\t\t\t\t(type "Bottom Solder Mask")'
+        '\n\t\t\t\t(color "Green")\n\t\t\t\t(thickness 0.01)\n\t\t\t)',
+        '\t\t\t(layer "B.SilkS"\n\t\t\t\t(type "Bottom Silk Screen")\n\t\t\t)',
+        '\t\t\t(copper_finish "HAL lead-free")',
+        "\t\t)",
+        "\t\t(pad_to_mask_clearance 0)",
+        "\t)",
+        '\t(property "VERSION" "%s")' % revision,
+        '\t(net 0 "")',
+        '\t(net 1 "GND")',
+    ]
+    for footprint in footprints:
+        side = "F" if footprint.layer == pcbnew.F_Cu else "B"
+        x, y = footprint.position
+        lines += [
+            '\t(footprint "%s:%s"' % (footprint.lib_id.nickname, footprint.lib_id.name),
+            '\t\t(layer "%s.Cu")' % side,
+            "\t\t(at %.4f %.4f %g)" % (x / 1e6, y / 1e6, footprint.orientation),
+            '\t\t(property "Reference" "%s"\n\t\t\t(at 0 -1.5 0)\n\t\t\t(layer "%s.SilkS")\n\t\t)'
+            % (footprint.reference, side),
+            '\t\t(property "Value" "%s"\n\t\t\t(at 0 1.5 0)\n\t\t\t(layer "%s.Fab")\n\t\t)'
+            % (footprint.value, side),
+        ]
+        for name, text in footprint.fields.items():
+            lines.append(
+                '\t\t(property "%s" "%s"\n\t\t\t(hide yes)\n\t\t)' % (name, text)
+            )
+        lines.append(
+            '\t\t(fp_line\n\t\t\t(start -1 -0.5)\n\t\t\t(end 1 -0.5)\n\t\t\t(layer "%s.SilkS")\n\t\t)'
+            % side
+        )
+        for pad in range(padCounts[footprint.reference[0]]):
+            lines.append(
+                '\t\t(pad "%d" smd rect\n\t\t\t(at %.2f 0)\n\t\t\t(size 0.6 0.5)'
+                '\n\t\t\t(layers "%s.Cu" "%s.Paste" "%s.Mask")\n\t\t\t(net 1 "GND")\n\t\t)'
+                % (pad + 1, pad * 0.5 - 0.25, side, side, side)
+            )
+        lines.append("\t)")
+    lines += [
+        '\t(gr_rect\n\t\t(start 0 0)\n\t\t(end 300 200)\n\t\t(layer "Edge.Cuts")\n\t)',
+        ")",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def make_board(count, directory, seed=0, copper_layers=4):
+    """Return a board of count footprints, saved in directory as well."""
+    import pcbnew
+
+    footprints = make_footprints(count, seed)
+    text = board_text(footprints, copper_layers)
+    board_file = os.path.join(directory, "synthetic_%d.kicad_pcb" % count)
+    with open(board_file, "w", encoding="utf-8") as f:
+        f.write(text)
+    return pcbnew.BOARD(board_file, footprints, copper_layers, text)
@@ -1,9 +1,22 @@
-import wx
+import os
 
-try:
-    from .plugin import Plugin
+# set to 1 by the command line for its processes, nothing is registered and
+# wx is not needed; the PCB Editor leaves it unset and gets the plugin
+headlessVariable = "DOCS_HEADLESS"
 
-    plugin = Plugin()
-    plugin.register()
-except Exception as e:
-    wx.MessageBox("Error: " + str(e))
+if os.environ.get(headlessVariable) != "1":
+    try:
+        import wx
+    except ImportError:
+        # a Python without wx can't host the plugin, e.g. "python -m plugins"
+        # outside of KiCad
+        wx = None
+
+    if wx is not None:
+        try:
+            from .plugin import Plugin
+
+            plugin = Plugin()
+            plugin.register()
+        except Exception as e:
+            wx.MessageBox("Error: " + str(e))
@@ -0,0 +1,99 @@
+"""Generate the production files of a board without the PCB Editor.
+
+    python -m plugins board.kicad_pcb [--config docs.config.ini]
+
+Progress goes to stdout and errors to stderr, one json object per line.
+The exit code is 0 when every file was generated, 1 when a stage failed
+and 2 when the board could not be loaded.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+from .messages import set_error_handler
+
+
+def emit(stream, **event):
+    stream.write(json.dumps(event) + "\n")
+    stream.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m plugins",
+        description="Generate the production files of a KiCad board.",
+    )
+    parser.add_argument("board", help="the .kicad_pcb file")
+    parser.add_argument(
+        "--config", help="settings file, docs.config.ini next to the board by default"
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+
+    def elapsed():
+        return round(time.perf_counter() - start, 3)
+
+    # errors the stages report and carry on after
+    reported = []
+
+    def error_handler(message, title="Error"):
+        reported.append(message)
+        emit(sys.stderr, event="error", message=message)
+
+    set_error_handler(error_handler)
+
+    board_file = os.path.abspath(args.board)
+    try:
+        import pcbnew
+
+        from .logs import get_logger
+        from .pipeline import Pipeline, Settings, configFileName
+        from .process import ProcessManager
+
+        board = pcbnew.LoadBoard(board_file)
+    except Exception as e:
+        emit(
+            sys.stderr, event="error", message="Failed to load %s: %s" % (board_file, e)
+        )
+        return 2
+    emit(sys.stdout, event="loaded", board=board_file, seconds=elapsed())
+
+    logger = get_logger(board_file)
+    settings = Settings()
+    config_file = args.config or os.path.join(
+        os.path.dirname(board_file), configFileName
+    )
+    settings.read(config_file, logger)
+
+    def report(percent):
+        emit(sys.stdout, event="progress", percent=percent)
+
+    def stage_finished(name, status):
+        emit(sys.stdout, event="stage", stage=name, status=status, seconds=elapsed())
+
+    pipeline = Pipeline(
+        ProcessManager(logger, board), settings, logger, report, stage_finished
+    )
+    folder = pipeline.run()
+    for name, error in pipeline.errors.items():
+        emit(sys.stderr, event="error", stage=name, message=str(error))
+    emit(
+        sys.stdout,
+        event="done",
+        output=folder,
+        failed=list(pipeline.errors),
+        skipped=pipeline.skipped,
+        memory=pipeline.memory,
+        seconds=elapsed(),
+    )
+    if folder is None or pipeline.errors or reported:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Zip a folder with its files compressed on worker threads.
+
+zipfile compresses every member on the thread writing the archive. Here the
+members are deflated ahead of the writer on a thread pool, zlib and crc32
+release the GIL on large buffers, and written in order as they are ready.
+Files already compressed are stored as is.
+"""
+
+import os
+import time
+import zlib
+import struct
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+compressionLevel = 6
+archiveWorkers = 4
+storedExtensions = (".zip", ".xlsx", ".png", ".webp", ".jpg", ".jpeg", ".gz", ".7z")
+
+# archives above these limits need zip64, left to zipfile
+maxArchiveSize = 0xFFFFFFFF - 1
+maxMembers = 0xFFFF
+
+localHeader = struct.Struct("<4s5H3L2H")
+centralHeader = struct.Struct("<4s6H3L5H2L")
+endRecord = struct.Struct("<4s4H2LH")
+utf8Flag = 0x800
+
+
+def dos_time(mtime):
+    t = time.localtime(mtime)
+    year = max(t.tm_year, 1980)
+    return (
+        t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2,
+        (year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday,
+    )
+
+
+def list_members(root):
+    """Return the (name, path) of the directories and files below root, sorted."""
+    members = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        relative = os.path.relpath(dirpath, root)
+        if relative != ".":
+            members.append((relative.replace(os.sep, "/") + "/", dirpath))
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            members.append((os.path.relpath(path, root).replace(os.sep, "/"), path))
+    return members
+
+
+def compress_member(path, level):
+    """Return (method, crc, size, data) of the file at path, deflated if it helps."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    crc = zlib.crc32(raw)
+    if level > 0 and not path.lower().endswith(storedExtensions):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        data = compressor.compress(raw) + compressor.flush()
+        if len(data) < len(raw):
+            return zipfile.ZIP_DEFLATED, crc, len(raw), data
+    return zipfile.ZIP_STORED, crc, len(raw), raw
+
+
+def write_zip(zip_file, root, level=compressionLevel, workers=archiveWorkers):
+    """Write the content of root to zip_file, return the number of members."""
+    members = list_members(root)
+    sizes = [os.path.getsize(p) for n, p in members if not n.endswith("/")]
+    if len(members) > maxMembers or sum(sizes) > maxArchiveSize:
+        return write_zip64(zip_file, root, members, level)
+
+    central = []
+    offset = 0
+    temp_file = zip_file + ".part"
+    with open(temp_file, "wb") as out, ThreadPoolExecutor(
+        max_workers=max(1, workers)
+    ) as executor:
+        # compress a few members ahead of the writer, not the whole folder
+        pending = deque()
+        queue = iter(members)
+
+        def submit():
+            for name, path in queue:
+                future = None
+                if not name.endswith("/"):
+                    future = executor.submit(compress_member, path, level)
+                pending.append((name, path, future))
+                return
+
+        for _ in range(max(1, workers) * 2):
+            submit()
+        while pending:
+            name, path, future = pending.popleft()
+            submit()
+            if future is None:
+                method, crc, size, data = zipfile.ZIP_STORED, 0, 0, b""
+                attributes = (0o40775 << 16) | 0x10
+            else:
+                method, crc, size, data = future.result()
+                attributes = (os.stat(path).st_mode & 0xFFFF) << 16
+            mod_time, mod_date = dos_time(os.path.getmtime(path))
+            encoded = name.encode("utf-8")
+            header = (20, utf8Flag, method, mod_time, mod_date, crc, len(data), size)
+            out.write(localHeader.pack(b"PK\x03\x04", *header, len(encoded), 0))
+            out.write(encoded)
+            out.write(data)
+            central.append(
+                centralHeader.pack(
+                    b"PK\x01\x02",
+                    3 << 8 | 20,  # made on unix by zip 2.0, for the attributes
+                    *header,
+                    len(encoded),
+                    0,
+                    0,
+                    0,
+                    0,
+                    attributes,
+                    offset,
+                )
+                + encoded
+            )
+            offset += localHeader.size + len(encoded) + len(data)
+
+        directory = b"".join(central)
+        out.write(directory)
+        out.write(
+            endRecord.pack(
+                b"PK\x05\x06",
+                0,
+                0,
+                len(central),
+                len(central),
+                len(directory),
+                offset,
+                0,
+            )
+        )
+    os.replace(temp_file, zip_file)
+    return len(members)
+
+
+def write_zip64(zip_file, root, members, level):
+    """Write an archive too large for write_zip with zipfile, on one thread."""
+    method = zipfile.ZIP_DEFLATED if level > 0 else zipfile.ZIP_STORED
+    with zipfile.ZipFile(zip_file, "w", method, allowZip64=True) as archive:
+        for name, path in members:
+            if name.endswith("/") or path.lower().endswith(storedExtensions):
+                archive.write(path, name, zipfile.ZIP_STORED)
+            else:
+                archive.write(path, name, method, level)
+    return len(members)
@@ -0,0 +1,189 @@
+"""Generate the production files of many boards, each in its own process.
+
+    python -m plugins.batch boards/ other.kicad_pcb [--jobs 4] [--manifest m.json]
+
+Directories are searched for .kicad_pcb files. Every board runs the command
+line of this package in a worker process, up to --jobs at a time. Boards of
+the same directory share its .docs_cache/ and kicad_app.log, so they run one
+after the other. The json manifest lists the status, time and outputs per
+board.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from . import headlessVariable
+
+boardExtension = ".kicad_pcb"
+# KiCad's autosave copies next to the board
+skippedPrefixes = ("_autosave-",)
+
+
+def find_boards(paths):
+    """Return the board files named or found below the directories in paths."""
+    boards = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+                for filename in sorted(filenames):
+                    if filename.endswith(boardExtension) and not filename.startswith(
+                        skippedPrefixes
+                    ):
+                        boards.append(os.path.join(dirpath, filename))
+        else:
+            boards.append(path)
+    # a board given twice is generated once
+    return list(dict.fromkeys(os.path.abspath(board) for board in boards))
+
+
+def run_board(board_file, config_file=None, timeout=None):
+    """Run the command line for board_file in a new process, return its record."""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    command = [sys.executable, "-m", os.path.basename(package_dir), board_file]
+    if config_file:
+        command += ["--config", config_file]
+    env = dict(os.environ)
+    env[headlessVariable] = "1"
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(package_dir)] + [p for p in sys.path if p]
+    )
+
+    record = {
+        "board": board_file,
+        "status": "failed",
+        "exit_code": None,
+        "seconds": None,
+        "output": None,
+        "archive": None,
+        "failed_stages": [],
+        "skipped_stages": [],
+        "memory": {},
+        "errors": [],
+    }
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=os.path.dirname(board_file),
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        record["errors"].append("Timed out after %s s" % timeout)
+        return record
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    record["exit_code"] = result.returncode
+
+    for line in result.stdout.splitlines():
+        event = parse_event(line)
+        if event.get("event") == "done":
+            record["output"] = event.get("output")
+            record["failed_stages"] = event.get("failed", [])
+            record["skipped_stages"] = event.get("skipped", [])
+            record["memory"] = event.get("memory", {})
+    for line in result.stderr.splitlines():
+        event = parse_event(line)
+        if event.get("event") == "error":
+            record["errors"].append(event.get("message"))
+        elif line.strip() and not event:
+            # tracebacks and warnings that aren't json
+            record["errors"].append(line)
+
+    if record["output"] and os.path.isfile(record["output"] + ".zip"):
+        record["archive"] = record["output"] + ".zip"
+    if result.returncode == 0:
+        record["status"] = "ok"
+    return record
+
+
+def parse_event(line):
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return {}
+    return event if isinstance(event, dict) else {}
+
+
+def run_batch(boards, jobs, config_file=None, timeout=None, finished=None):
+    """Generate boards on up to jobs processes, return their records in order.
+
+    finished(record) is called as each board ends.
+    """
+    groups = {}
+    for board in boards:
+        groups.setdefault(os.path.dirname(board), []).append(board)
+
+    def run_group(group):
+        records = []
+        for board in group:
+            record = run_board(board, config_file, timeout)
+            if finished is not None:
+                finished(record)
+            records.append(record)
+        return records
+
+    records = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        for group_records in executor.map(run_group, groups.values()):
+            for record in group_records:
+                records[record["board"]] = record
+    return [records[board] for board in boards]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m plugins.batch",
+        description="Generate the production files of many KiCad boards.",
+    )
+    parser.add_argument("paths", nargs="+", help="boards or directories with boards")
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count() or 1, help="boards run at a time"
+    )
+    parser.add_argument(
+        "--manifest", default="manifest.json", help="json file with the results"
+    )
+    parser.add_argument("--config", help="settings file used for every board")
+    parser.add_argument("--timeout", type=float, help="seconds allowed per board")
+    args = parser.parse_args(argv)
+
+    boards = find_boards(args.paths)
+    start = time.perf_counter()
+
+    def finished(record):
+        sys.stdout.write(
+            json.dumps(
+                {
+                    "event": "board",
+                    "board": record["board"],
+                    "status": record["status"],
+                    "seconds": record["seconds"],
+                }
+            )
+            + "\n"
+        )
+        sys.stdout.flush()
+
+    records = run_batch(boards, args.jobs, args.config, args.timeout, finished)
+    manifest = {
+        "jobs": args.jobs,
+        "seconds": round(time.perf_counter() - start, 3),
+        "ok": sum(record["status"] == "ok" for record in records),
+        "failed": sum(record["status"] != "ok" for record in records),
+        "boards": records,
+    }
+    with open(args.manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return 0 if manifest["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Metadata index of a .kicad_pcb file.
+
+The index is built in one pass over a memory-mapped board file and records
+the byte spans of the top level sections. Small sections (setup, property,
+title_block, ...) are kept as bytes so that every metadata query is answered
+without touching the file again.
+"""
+
+import os
+import re
+import mmap
+from collections import defaultdict, OrderedDict
+
+from . import sexp
+
+keptSections = ("version", "generator", "general", "setup", "property", "title_block")
+cacheSize = 8
+
+root_regex = re.compile(rb"\(\s*kicad_pcb\b")
+indent_regex = re.compile(rb"\n([ \t]+)\(")
+paren_regex = re.compile(rb'[()]|"(?:[^"\\]|\\.)*"')
+head_regex = re.compile(rb"\(\s*([^\s()\"]+)")
+version_regex = re.compile(rb'property "VERSION" "([^"]+)"')
+
+_cache = OrderedDict()
+
+
+class BoardIndex:
+    def __init__(self, board_file):
+        self.board_file = os.path.abspath(board_file)
+        stat = os.stat(self.board_file)
+        self.key = (stat.st_mtime_ns, stat.st_size)
+        self.spans = defaultdict(list)
+        self.data = defaultdict(list)
+        self.revision = None
+
+        if stat.st_size == 0:
+            return
+
+        with open(self.board_file, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                spans = scan_sections(mm)
+
+                for head, start, end in spans:
+                    self.spans[head].append((start, end))
+                    if head in keptSections:
+                        self.data[head].append(mm[start:end])
+
+                self.revision = self._find_revision(mm)
+
+    @staticmethod
+    def _scan_indented(mm):
+        """Find the sections from KiCad's indentation, None if it can't be trusted."""
+        root = root_regex.search(mm)
+        if root is None:
+            return None
+        indent = indent_regex.search(mm, root.end())
+        if indent is None:
+            return None
+
+        section_regex = re.compile(
+            rb"\n" + re.escape(indent.group(1)) + rb"\(([^\s()\"]+)"
+        )
+        root_end = mm.rfind(b")")
+        starts = [
+            (m.group(1), m.start() + 1)
+            for m in section_regex.finditer(mm, root.end(), root_end)
+        ]
+
+        spans = []
+        for i, (head, start) in enumerate(starts):
+            end = starts[i + 1][1] - 1 if i + 1 < len(starts) else root_end
+            # trailing whitespace belongs to the parent
+            while end > start and mm[end - 1 : end] in b" \t\r\n":
+                end -= 1
+            if mm[end - 1 : end] != b")":
+                return None
+            spans.append((head.decode("utf-8"), start + len(indent.group(1)), end))
+        return spans
+
+    @staticmethod
+    def _scan_nested(mm):
+        """Find the sections by counting brackets, for files not written by KiCad."""
+        spans = []
+        depth = 0
+        start = 0
+        for m in paren_regex.finditer(mm):
+            token = m.group()
+            if token == b"(":
+                depth += 1
+                if depth == 2:
+                    start = m.start()
+            elif token == b")":
+                if depth == 2:
+                    head = head_regex.match(mm, start)
+                    if head is not None:
+                        spans.append((head.group(1).decode("utf-8"), start, m.end()))
+                depth -= 1
+        return spans
+
+    def _find_revision(self, mm):
+        for data in self.data["property"]:
+            match = version_regex.match(data, 1)
+            if match:
+                return match.group(1).decode("utf-8")
+        # older boards may keep the property somewhere else in the file
+        match = version_regex.search(mm)
+        if match:
+            return match.group(1).decode("utf-8")
+        return None
+
+    def section(self, head):
+        """Return the bytes of the first kept section named head, or None."""
+        data = self.data.get(head)
+        return data[0] if data else None
+
+    def stackup(self):
+        """Return the parsed (stackup ...) list of the setup section."""
+        setup = self.section("setup")
+        if setup is None:
+            return []
+        return sexp.find_sections(setup, ["stackup"]).get("stackup", [])
+
+    def title_block(self):
+        """Return the title block fields as a dict, comments keyed as 'comment N'."""
+        fields = {}
+        data = self.section("title_block")
+        if data is None:
+            return fields
+        for item in sexp.parse(data)[1:]:
+            if isinstance(item, list) and len(item) > 1:
+                if item[0] == "comment":
+                    fields["comment " + str(item[1])] = item[2]
+                else:
+                    fields[item[0]] = item[1]
+        return fields
+
+
+def scan_sections(data):
+    """Return the (head, start, end) of every top level section of board data."""
+    spans = BoardIndex._scan_indented(data)
+    if spans is None:
+        spans = BoardIndex._scan_nested(data)
+    return spans
+
+
+def get_board_index(board_file):
+    """Return the index of board_file, rebuilt only if its mtime or size changed."""
+    path = os.path.abspath(board_file)
+    stat = os.stat(path)
+    index = _cache.get(path)
+    if index is None or index.key != (stat.st_mtime_ns, stat.st_size):
+        index = BoardIndex(path)
+        _cache[path] = index
+        while len(_cache) > cacheSize:
+            _cache.popitem(last=False)
+    _cache.move_to_end(path)
+    return index
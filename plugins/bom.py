@@ -0,0 +1,94 @@
+"""BOM line grouping and designator index."""
+
+from .config import bomGroupKeys
+
+
+def parse_group_keys(text):
+    """Parse 'Mfr_Part_Number; Value+Footprint' into [(...), (...)]."""
+    group_keys = []
+    for group in text.split(";"):
+        keys = tuple(k.strip() for k in group.split("+") if k.strip())
+        if keys:
+            group_keys.append(keys)
+    return group_keys
+
+
+class BomGrouper:
+    """Merge footprints into BOM lines with one dict lookup per footprint.
+
+    A footprint is grouped on the first key set of group_keys whose fields
+    are all non-empty, footprints without any complete key set get a line
+    of their own. Do-not-populate footprints are grouped apart from the
+    fitted ones, on lines with a Quantity and Total price of 0 like their
+    absence from the position file.
+    """
+
+    def __init__(self, group_keys=None):
+        self.group_keys = group_keys or bomGroupKeys
+        self.lines = []
+        self.unit_prices = []
+        self.index = {}
+        self.designators = {}  # designator -> position of its BOM line
+        self.dnp = set()
+
+    def group_key(self, line):
+        for keys in self.group_keys:
+            values = tuple(line.get(key) or "" for key in keys)
+            if all(values):
+                return keys, values
+        return None
+
+    def add(self, designator, line, dnp=False):
+        """Add a footprint, line holds its BOM fields with a float Total price.
+
+        Returns the position of the BOM line the footprint ended up in.
+        """
+        key = self.group_key(line)
+        if key is not None:
+            key = (dnp,) + key
+        pos = self.index.get(key) if key is not None else None
+        if dnp:
+            line["Quantity"] = 0
+            line["Total price"] = 0.0
+
+        if pos is None:
+            pos = len(self.lines)
+            line["Designator"] = [designator]
+            self.lines.append(line)
+            self.unit_prices.append(line["Total price"])
+            if key is not None:
+                self.index[key] = pos
+        else:
+            row = self.lines[pos]
+            row["Designator"].append(designator)
+            row["Quantity"] += 0 if dnp else 1
+            row["Total price"] += self.unit_prices[pos]
+
+        self.designators[designator] = pos
+        if dnp:
+            self.dnp.add(designator)
+        return pos
+
+    def line_of(self, designator):
+        """Return the BOM line holding designator, or None."""
+        pos = self.designators.get(designator)
+        return None if pos is None else self.lines[pos]
+
+    def is_placed(self, designator):
+        """True if designator is in the BOM and not marked do-not-populate."""
+        return designator in self.designators and designator not in self.dnp
+
+    def missing_from_bom(self, designators):
+        """Return the placement designators that have no BOM line."""
+        return [d for d in designators if d not in self.designators]
+
+    def without_placement(self, designators):
+        """Return the BOM designators that are not among the placed designators."""
+        placed = set(designators)
+        return [d for d in self.designators if d not in placed]
+
+    def rows(self):
+        """Return the BOM lines with the designators joined."""
+        return [
+            dict(line, Designator=", ".join(line["Designator"])) for line in self.lines
+        ]
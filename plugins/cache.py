@@ -0,0 +1,147 @@
+"""Persistent cache of the generated files, kept per project.
+
+Every stage stores its output files under a key hashed from its inputs:
+the board content it reads, the settings and the plugin sources. A later
+run with the same key copies the files back instead of running the stage.
+Entries are evicted least recently used first once the cache grows beyond
+its size limit.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+
+manifestName = "files.json"
+cacheMaxSize = 512 * 1024 * 1024
+
+_code_digest = None
+
+
+def digest(*parts):
+    """Return the sha256 of parts, bytes and str as is, the rest as json."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+        h.update(hashlib.sha256(part).digest())
+    return h.hexdigest()
+
+
+def code_digest():
+    """Return the digest of the plugin sources, a new version invalidates all."""
+    global _code_digest
+    if _code_digest is None:
+        plugin_dir = os.path.dirname(os.path.abspath(__file__))
+        h = hashlib.sha256()
+        for name in sorted(os.listdir(plugin_dir)):
+            if name.endswith((".py", ".cf")):
+                h.update(name.encode("utf-8"))
+                with open(os.path.join(plugin_dir, name), "rb") as f:
+                    h.update(hashlib.sha256(f.read()).digest())
+        _code_digest = h.hexdigest()
+    return _code_digest
+
+
+def list_files(root):
+    """Return the files below root as sorted relative paths with / separators."""
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.relpath(os.path.join(dirpath, filename), root)
+            files.append(path.replace(os.sep, "/"))
+    return sorted(files)
+
+
+def trim_directory(directory, max_size):
+    """Remove the least recently used files of directory until it fits max_size.
+
+    The mtime of a file is its last use, callers touch the files they reuse.
+    """
+    files = []
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+class StageCache:
+    def __init__(self, cache_dir, max_size=cacheMaxSize):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def entry(self, stage, key):
+        return os.path.join(self.cache_dir, stage + "-" + key)
+
+    def restore(self, stage, key, output_dir):
+        """Copy the files stored for (stage, key) to output_dir.
+
+        Returns the restored files, or None on a miss.
+        """
+        entry = self.entry(stage, key)
+        manifest = os.path.join(entry, manifestName)
+        try:
+            with open(manifest, encoding="utf-8") as f:
+                files = json.load(f)["files"]
+        except (OSError, ValueError, KeyError):
+            return None
+        for name in files:
+            target = os.path.join(output_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(entry, name), target)
+        # the manifest mtime orders the entries for eviction
+        os.utime(manifest)
+        return files
+
+    def store(self, stage, key, output_dir, files):
+        """Copy files, relative to output_dir, into the entry for (stage, key)."""
+        entry = self.entry(stage, key)
+        temp_entry = entry + ".part"
+        shutil.rmtree(temp_entry, ignore_errors=True)
+        size = 0
+        for name in files:
+            target = os.path.join(temp_entry, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(output_dir, name), target)
+            size += os.path.getsize(target)
+        # stages writing no files are cached too, with an empty entry
+        os.makedirs(temp_entry, exist_ok=True)
+        # written last, an entry without manifest is never restored
+        with open(os.path.join(temp_entry, manifestName), "w", encoding="utf-8") as f:
+            json.dump({"files": list(files), "size": size}, f)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(temp_entry, entry)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits max_size."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            manifest = os.path.join(self.cache_dir, name, manifestName)
+            try:
+                with open(manifest, encoding="utf-8") as f:
+                    size = json.load(f)["size"]
+                entries.append((os.path.getmtime(manifest), size, name))
+            except (OSError, ValueError, KeyError):
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+            total -= size
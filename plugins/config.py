@@ -11,6 +11,15 @@ drillDir = "Drill"
 gerberArchiveName = "gerber.zip"
 outputFolder = "production"
 stackFileDir = "Report Board Stack"
+# kept in the project directory between runs
+cacheDir = ".docs_cache"
+
+# BOM lines are merged on the first key set whose fields are all non-empty,
+# "group_by" in the [bom] section of docs.config.ini overrides it
+bomGroupKeys = [
+    ("Mfr_Part_Number",),
+    ("Value", "Footprint"),
+]
 
 # for gerber files
 plotPlan = [
@@ -0,0 +1,108 @@
+"""Write report tables to csv and xlsx files in one pass over their rows.
+
+The rows are dicts sharing the keys of the first one. Text holding a
+number is written to the xlsx sheet as a number, like a spreadsheet reading
+the csv would, unless it starts with a zero. The column widths are the
+longest text of each column.
+Sheets of more than constantMemoryRows rows are streamed to the file with
+xlsxwriter's constant_memory mode.
+"""
+
+import re
+import csv
+
+constantMemoryRows = 10000
+
+# leading zeros are part of names like 0402, not numbers
+number_regex = re.compile(r"[-+]?((0|[1-9]\d*)(\.\d*)?|\.\d+)([eE][-+]?\d+)?")
+# the look pandas gave the header row
+headerFormat = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+
+def cell_value(value, na_rep):
+    """Return the value to write to the sheet and its text, for the width."""
+    if value is None or value == "":
+        return na_rep, na_rep
+    if isinstance(value, bool):
+        return value, str(value)
+    if isinstance(value, (int, float)):
+        return value, str(value)
+    text = str(value)
+    if number_regex.fullmatch(text):
+        number = float(text)
+        if number.is_integer() and "." not in text and "e" not in text.lower():
+            number = int(text)
+        return number, text
+    return text, text
+
+
+def write_table(
+    rows,
+    csv_file=None,
+    xlsx_file=None,
+    sheet_name="Sheet1",
+    na_rep="",
+    skip=None,
+    width_scale=1,
+    font=None,
+):
+    """Write rows to csv_file and the sheet sheet_name of xlsx_file, either optional.
+
+    Rows for which skip(row) is true are left out. Empty cells are written
+    as na_rep to the sheet, the column widths are multiplied by width_scale
+    and font, a dict of xlsxwriter format properties, applies to all cells.
+    """
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = [len(column) for column in columns]
+
+    csv_out = None
+    writer = None
+    workbook = None
+    try:
+        if csv_file is not None:
+            csv_out = open(csv_file, "w", newline="", encoding="utf-8")
+            writer = csv.writer(csv_out)
+            writer.writerow(columns)
+        if xlsx_file is not None:
+            import xlsxwriter
+
+            workbook = xlsxwriter.Workbook(
+                xlsx_file, {"constant_memory": len(rows) > constantMemoryRows}
+            )
+            sheet = workbook.add_worksheet(sheet_name)
+            header_format = workbook.add_format(headerFormat)
+            for col, column in enumerate(columns):
+                sheet.write_string(0, col, column, header_format)
+
+        row_number = 0
+        for row in rows:
+            if skip is not None and skip(row):
+                continue
+            values = [row[column] for column in columns]
+            if writer is not None:
+                writer.writerow(values)
+            if workbook is not None:
+                row_number += 1
+                for col, value in enumerate(values):
+                    value, text = cell_value(value, na_rep)
+                    if isinstance(value, str):
+                        # text starting with = stays text
+                        sheet.write_string(row_number, col, value)
+                    elif isinstance(value, bool):
+                        sheet.write_boolean(row_number, col, value)
+                    else:
+                        sheet.write_number(row_number, col, value)
+                    if len(text) > widths[col]:
+                        widths[col] = len(text)
+
+        if workbook is not None:
+            cell_format = workbook.add_format(font) if font else None
+            for col, width in enumerate(widths):
+                sheet.set_column(col, col, width * width_scale, cell_format)
+    finally:
+        if csv_out is not None:
+            csv_out.close()
+        if workbook is not None:
+            workbook.close()
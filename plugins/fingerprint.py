@@ -0,0 +1,181 @@
+"""Content fingerprints of the board in the PCB Editor, unsaved changes included."""
+
+import re
+import fnmatch
+import hashlib
+
+import pcbnew
+
+from .board import scan_sections
+
+# the KiCad file writer, renamed between versions
+formatterNames = ("PCB_IO_KICAD_SEXPR", "PCB_PLUGIN", "PCB_IO")
+
+# board wide sections, every layer depends on them
+commonSections = (
+    "version",
+    "generator",
+    "generator_version",
+    "general",
+    "paper",
+    "title_block",
+    "layers",
+    "setup",
+    "property",
+    "net",
+    "net_class",
+)
+# sections plotted on every layer whatever layers they name: through vias
+# cross the inner layers and untented vias reach the mask layers
+allLayerSections = ("via",)
+# sections split into their children, so a changed silkscreen reference does
+# not change the copper layers of the footprint
+splitSections = ("footprint", "module")
+# silkscreen is plotted with the mask subtracted
+layerDependencies = {
+    pcbnew.F_SilkS: (pcbnew.F_Mask,),
+    pcbnew.B_SilkS: (pcbnew.B_Mask,),
+}
+# the board file keeps the layer names of KiCad 5, GetStandardLayerName
+# returns the ones of the PCB Editor since KiCad 6
+fileLayerNames = {
+    "F.Silkscreen": "F.SilkS",
+    "B.Silkscreen": "B.SilkS",
+    "F.Adhesive": "F.Adhes",
+    "B.Adhesive": "B.Adhes",
+    "F.Courtyard": "F.CrtYd",
+    "B.Courtyard": "B.CrtYd",
+    "User.Drawings": "Dwgs.User",
+    "User.Comments": "Cmts.User",
+    "User.Eco1": "Eco1.User",
+    "User.Eco2": "Eco2.User",
+}
+
+layer_regex = re.compile(rb'\(layers?((?:\s+(?:"[^"]*"|[^\s()"]+))+)\s*\)')
+name_regex = re.compile(rb'"([^"]*)"|([^\s()"]+)')
+
+
+def board_text(board):
+    """Return board formatted as KiCad saves it, None if pcbnew can't format it."""
+    for name in formatterNames:
+        formatter_class = getattr(pcbnew, name, None)
+        if formatter_class is not None:
+            break
+    else:
+        return None
+    try:
+        formatter = formatter_class()
+        formatter.Format(board)
+        text = formatter.GetStringOutput(True)
+    except Exception:
+        return None
+    if isinstance(text, str):
+        text = text.encode("utf-8")
+    return text
+
+
+def board_fingerprint(board, text=None):
+    """Return the sha256 of the board content, None if it can't be computed.
+
+    text is the board as board_text returns it, formatted here if not given.
+    """
+    if text is None:
+        text = board_text(board)
+    if text is None:
+        return None
+    return hashlib.sha256(text).hexdigest()
+
+
+def expand_layer(name, layer_names):
+    """Return the layers of layer_names a name like F.Cu, *.Cu or F&B.Cu covers."""
+    if "&" in name:
+        sides, _, kind = name.partition(".")
+        return [side + "." + kind for side in sides.split("&")]
+    if "*" in name:
+        return fnmatch.filter(layer_names, name)
+    return [name]
+
+
+def item_layers(item, layer_names):
+    """Return the layers of layer_names item is on, None if it names no layer."""
+    named = set()
+    for match in layer_regex.finditer(item):
+        for quoted, bare in name_regex.findall(match.group(1)):
+            named.add((quoted or bare).decode("utf-8"))
+    if not named:
+        return None
+    layers = set()
+    for name in named:
+        layers.update(expand_layer(name, layer_names))
+    return layers
+
+
+def layer_fingerprints(board, layers, text=None):
+    """Return {layer id: sha256} of the board items plotted on each layer.
+
+    The fingerprint of a layer changes only if the board wide settings or an
+    item on that layer changed. text is the board as board_text returns it,
+    formatted here if not given. Returns None if the board can't be formatted.
+    """
+    if text is None:
+        text = board_text(board)
+    if text is None:
+        return None
+    names = {}
+    for layer in layers:
+        name = pcbnew.BOARD.GetStandardLayerName(layer)
+        names[fileLayerNames.get(name, name)] = layer
+    layer_names = list(names)
+    common = hashlib.sha256()
+    hashes = {name: hashlib.sha256() for name in layer_names}
+
+    for head, start, end in scan_sections(text):
+        item = text[start:end]
+        if head in commonSections:
+            common.update(item)
+            continue
+        if head in allLayerSections:
+            item_digest = hashlib.sha256(item).digest()
+            targets = layer_names
+        elif head in splitSections:
+            # children are counted on their own layers, the rest (position,
+            # attributes) on every layer of the footprint
+            header = hashlib.sha256()
+            targets = set()
+            last = 0
+            for _, child_start, child_end in scan_sections(item):
+                child = item[child_start:child_end]
+                header.update(item[last:child_start])
+                last = child_end
+                child_layers = item_layers(child, layer_names)
+                if child_layers is None:
+                    header.update(child)
+                    continue
+                targets.update(child_layers)
+                child_digest = hashlib.sha256(child).digest()
+                for name in child_layers:
+                    if name in hashes:
+                        hashes[name].update(child_digest)
+            header.update(item[last:])
+            item_digest = header.digest()
+            targets = targets or None
+        else:
+            item_digest = hashlib.sha256(item).digest()
+            targets = item_layers(item, layer_names)
+        # items without any layer are counted everywhere
+        for name in layer_names if targets is None else targets:
+            if name in hashes:
+                hashes[name].update(item_digest)
+
+    common_digest = common.digest()
+    digests = {name: h.digest() for name, h in hashes.items()}
+    layer_digests = {layer: digests[name] for name, layer in names.items()}
+    fingerprints = {}
+    for layer, layer_digest in layer_digests.items():
+        h = hashlib.sha256(common_digest)
+        h.update(layer_digest)
+        for dependency in layerDependencies.get(layer, ()):
+            if dependency in layer_digests:
+                h.update(layer_digests[dependency])
+        fingerprints[layer] = h.hexdigest()
+    return fingerprints
@@ -0,0 +1,50 @@
+"""Snapshot of the board footprints."""
+
+
+class FootprintRecord:
+    """Everything the reports need from one footprint, read once from pcbnew."""
+
+    __slots__ = (
+        "reference",
+        "name",
+        "value",
+        "layer",
+        "attributes",
+        "x",
+        "y",
+        "orientation",
+        "in_pos",
+        "in_bom",
+        "dnp",
+        "mfr_pn",
+        "mfr_name",
+        "lcsc_pn",
+        "link",
+        "unit_price",
+        "rotation_offset",
+        "position_offset",
+    )
+
+    def __init__(self, reference, name, value, layer, attributes, x, y, orientation):
+        self.reference = reference
+        self.name = name
+        self.value = value
+        self.layer = layer  # "top", "bottom" or None
+        self.attributes = attributes
+        self.x = x  # nm, relative to the aux origin
+        self.y = y
+        self.orientation = orientation  # degrees
+        self.in_pos = True
+        self.in_bom = True
+        self.dnp = False
+        self.mfr_pn = ""
+        self.mfr_name = ""
+        self.lcsc_pn = ""
+        self.link = ""
+        self.unit_price = ""
+        self.rotation_offset = 0
+        self.position_offset = (0, 0)
+
+    def fields(self):
+        """Return the values of all slots, to compare or hash records."""
+        return tuple(getattr(self, name) for name in self.__slots__)
@@ -1,21 +1,104 @@
-import logging
+"""Logging to kicad_app.log next to the board, written on a background thread.
+
+get_logger returns a standard logging.Logger. Its records go through a queue
+to a listener thread, which formats them, writes them to a size rotated file
+and flushes every flushInterval seconds or flushRecords records. A call in
+the footprint loops only appends the record to the queue.
+"""
+
 import os
-from datetime import datetime
+import queue
+import atexit
+import logging
+import logging.handlers
+
+logFileName = "kicad_app.log"
+loggerName = "kicad_docs"
+logMaxBytes = 1 << 20
+logBackups = 3
+flushInterval = 1.0
+flushRecords = 256
+logFormat = "%(asctime)s - %(levelname)s - %(message)s"
+dateFormat = "%Y-%m-%d %H:%M:%S"
+
+_loggers = {}
+
+
+class BatchedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Flush the file every flushRecords records or when flush_pending() is called."""
+
+    def __init__(self, filename, max_bytes=logMaxBytes, backups=logBackups):
+        super().__init__(
+            filename,
+            maxBytes=max_bytes,
+            backupCount=backups,
+            encoding="utf-8",
+            delay=True,
+        )
+        self.pending = 0
+
+    def flush(self):
+        # StreamHandler.emit flushes after every record
+        self.pending += 1
+        if self.pending >= flushRecords:
+            self.flush_pending()
+
+    def flush_pending(self):
+        with self.lock:
+            if self.pending:
+                self.pending = 0
+                super().flush()
+
+    def doRollover(self):
+        self.pending = 0
+        super().doRollover()
+
+    def close(self):
+        self.flush_pending()
+        super().close()
+
+
+class BatchedQueueListener(logging.handlers.QueueListener):
+    """Flush the handlers whenever the queue stays empty for flushInterval."""
+
+    def dequeue(self, block):
+        if not block:
+            return self.queue.get(False)
+        while True:
+            try:
+                return self.queue.get(True, flushInterval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush_pending()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Leave the formatting to the listener thread."""
 
-class LoggerConfig:
-    def __init__(self):
-        self.name = "kicad_app.log"
+    def prepare(self, record):
+        if record.exc_info or record.stack_info:
+            # tracebacks can't wait for the listener
+            return super().prepare(record)
+        return record
 
-    def log(self, text, level):
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(self.name, 'a') as file:
-            file.write(current_time + " - " + str(level) + " - " + str(text) + "\r\n")
 
-    def debug(self, text):
-        self.log(text, "DEBUG")
+def get_logger(board_file):
+    """Return the logger writing to kicad_app.log in the directory of board_file."""
+    path = os.path.join(os.path.dirname(os.path.abspath(board_file)), logFileName)
+    logger = _loggers.get(path)
+    if logger is not None:
+        return logger
 
-    def info(self, text):
-        self.log(text, "INFO")
+    handler = BatchedRotatingFileHandler(path)
+    handler.setFormatter(logging.Formatter(logFormat, dateFormat))
+    records = queue.SimpleQueue()
+    listener = BatchedQueueListener(records, handler)
+    listener.start()
+    atexit.register(listener.stop)
 
-    def error(self, text):
-        self.log(text, "ERROR")
+    # not registered with logging.getLogger, one logger per project file
+    logger = logging.Logger(loggerName, logging.DEBUG)
+    logger.addHandler(DeferredQueueHandler(records))
+    logger.propagate = False
+    _loggers[path] = logger
+    return logger
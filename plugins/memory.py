@@ -0,0 +1,147 @@
+"""Peak memory of the stages of a run.
+
+A MemoryMonitor samples the resident set size of the process, and with
+tracemalloc on the peak of the memory allocated by Python, every
+sampleInterval seconds on a thread of its own. The peak of a stage is the
+highest sample taken while it ran, stages running at the same time share
+their samples. Plot and preview worker processes are not counted.
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+sampleInterval = 0.05
+
+
+def current_rss():
+    """Return the resident set size of this process in bytes, None if unknown."""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            return windows_rss()
+        import resource
+
+        # the peak rather than the current size, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return None
+
+
+def windows_rss():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(
+        ctypes.windll.kernel32.GetCurrentProcess(),
+        ctypes.byref(counters),
+        counters.cb,
+    ):
+        return None
+    return counters.WorkingSetSize
+
+
+def megabytes(size):
+    return None if size is None else round(size / (1 << 20), 1)
+
+
+class MemoryMonitor:
+    """Record the peak memory of the run and of every measured stage.
+
+    With trace the Python allocations are traced with tracemalloc, which
+    slows them down, otherwise only the resident set size is sampled.
+    """
+
+    def __init__(self, trace=True, interval=sampleInterval):
+        self.trace = trace
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peaks = {}
+        self.run_peak = [0, 0]
+        self.stopped = threading.Event()
+        self.thread = None
+        self.started_tracing = False
+
+    def start(self):
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.thread = threading.Thread(
+            target=self.sample_loop, name="memory monitor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.sample()
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def sample_loop(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        with self.lock:
+            traced = 0
+            if self.trace and tracemalloc.is_tracing():
+                traced = tracemalloc.get_traced_memory()[1]
+                # the next sample gets the peak since this one
+                tracemalloc.reset_peak()
+            rss = current_rss() or 0
+            for peak in [self.run_peak] + list(self.active.values()):
+                peak[0] = max(peak[0], traced)
+                peak[1] = max(peak[1], rss)
+
+    @contextmanager
+    def measure(self, name):
+        """Record the peak memory while the block runs as the peak of name."""
+        # earlier allocations count for the stages running before this one
+        self.sample()
+        with self.lock:
+            self.active[name] = [0, 0]
+        try:
+            yield
+        finally:
+            self.sample()
+            with self.lock:
+                self.peaks[name] = self.active.pop(name)
+
+    def peak_rss(self):
+        return self.run_peak[1]
+
+    def summary(self):
+        """Return {stage: {"traced_mb": ..., "rss_mb": ...}}, the run as "run"."""
+        summary = {}
+        with self.lock:
+            peaks = dict(self.peaks, run=self.run_peak)
+        for name, (traced, rss) in peaks.items():
+            summary[name] = {
+                "traced_mb": megabytes(traced) if self.trace else None,
+                "rss_mb": megabytes(rss),
+            }
+        return summary
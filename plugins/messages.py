@@ -0,0 +1,22 @@
+"""Error messages for the user, shown by the PCB Editor or the command line.
+
+The PCB Editor shows them in a message box. A headless run installs its own
+handler with set_error_handler, wx is then never imported.
+"""
+
+_error_handler = None
+
+
+def set_error_handler(handler):
+    """Send the errors to handler(message, title) instead of a message box."""
+    global _error_handler
+    _error_handler = handler
+
+
+def show_error(message, title="Error"):
+    if _error_handler is not None:
+        _error_handler(message, title)
+        return
+    import wx
+
+    wx.MessageBox(message, title, wx.OK | wx.ICON_ERROR)
@@ -0,0 +1,546 @@
+"""The generation pipeline, shared by the PCB Editor plugin and the command line.
+
+Nothing here depends on wx, errors are reported through messages.show_error.
+"""
+
+import gc
+import os
+import shutil
+import configparser
+from contextlib import nullcontext
+from datetime import datetime
+
+from .archive import write_zip, compressionLevel, archiveWorkers
+from .bom import parse_group_keys
+from .board import get_board_index
+from .cache import StageCache, cacheMaxSize, code_digest, digest, list_files
+from .fingerprint import board_text, board_fingerprint, layer_fingerprints
+from .memory import MemoryMonitor, megabytes
+from .messages import show_error
+from .placement import placementOrigins, unitScales
+from .rotations import rotationsFile
+from .scheduler import Scheduler, stageWorkers
+from .tracing import Tracer, set_tracer, span
+from .config import (
+    plotPlan,
+    gerberDir,
+    drillDir,
+    placementDir,
+    bomFileDir,
+    stackFileDir,
+    cacheDir,
+    layersJob,
+)
+from . import plot
+from .plot_worker import plotDesignSettings
+
+configFileName = "docs.config.ini"
+traceFileName = "trace.json"
+
+
+def bool_convert(text):
+    return text == "True"
+
+
+def delete_directory(directory_path):
+    if os.path.exists(directory_path):
+        try:
+            shutil.rmtree(directory_path)
+        except Exception as e:
+            print(f"Error deleting directory {directory_path}: {e}")
+            show_error(f"Error deleting directory {directory_path}: {e}")
+
+
+class Settings:
+    """The options of docs.config.ini, the defaults until read() finds one."""
+
+    def __init__(self):
+        self.plot_scale = 1
+        self.delete_single_page_files = True
+        self.del_temp_files = True
+        self.create_svg = False
+        self.plot_workers = 0
+        self.preview_dpis = []
+        self.preview_format = "png"
+        self.preview_workers = 0
+        self.cache_enabled = True
+        self.cache_max_size = cacheMaxSize
+        self.stage_workers = stageWorkers
+        self.bom_group_keys = None
+        self.archive_level = compressionLevel
+        self.archive_workers = archiveWorkers
+        self.trace_enabled = False
+        self.trace_file = traceFileName
+        self.memory_report = False
+        self.memory_budget = 0
+        self.rotations_file = rotationsFile
+        self.placement_origin = "aux"
+        self.placement_options = {}
+
+    def read(self, config_file, logger):
+        """Read the options of config_file, return False if it can't be read."""
+        config = configparser.ConfigParser()
+        plot_config = config.read(config_file)
+
+        if plot_config:
+            logger.info("plot_config SUCCESS " + str(plot_config))
+            try:
+                self.plot_scale = float(config.get("main", "scale"))
+            except Exception as e:
+                logger.warning(
+                    "Failed to get plot_scale from config, using default value 1: %s", e
+                )
+                self.plot_scale = 1
+            logger.info("Second plot_scale = " + str(self.plot_scale))
+            self.delete_single_page_files = bool_convert(
+                config.get("main", "delete_single_page_files")
+            )
+            self.del_temp_files = bool_convert(config.get("main", "del_temp_files"))
+            self.create_svg = bool_convert(config.get("main", "create_svg"))
+            self.plot_workers = config.getint("main", "plot_workers", fallback=0)
+            if config.has_option("preview", "dpi"):
+                self.preview_dpis = [
+                    int(dpi)
+                    for dpi in config.get("preview", "dpi").split(",")
+                    if dpi.strip()
+                ]
+            self.preview_format = config.get(
+                "preview", "format", fallback="png"
+            ).lower()
+            self.preview_workers = config.getint("preview", "workers", fallback=0)
+            self.stage_workers = config.getint(
+                "main", "stage_workers", fallback=stageWorkers
+            )
+            self.cache_enabled = config.getboolean("cache", "enabled", fallback=True)
+            if config.has_option("cache", "max_size_mb"):
+                self.cache_max_size = config.getint("cache", "max_size_mb") << 20
+            self.archive_level = config.getint(
+                "archive", "compression_level", fallback=compressionLevel
+            )
+            self.archive_workers = config.getint(
+                "archive", "workers", fallback=archiveWorkers
+            )
+            self.trace_enabled = config.getboolean("trace", "enabled", fallback=False)
+            self.trace_file = config.get("trace", "file", fallback=traceFileName)
+            self.memory_report = config.getboolean("memory", "report", fallback=False)
+            self.memory_budget = config.getint("memory", "budget_mb", fallback=0) << 20
+            if not config.getboolean("placement", "rotations", fallback=True):
+                self.rotations_file = None
+            elif config.has_option("placement", "rotations_file"):
+                # relative to the directory of the config file
+                self.rotations_file = os.path.join(
+                    os.path.dirname(os.path.abspath(config_file)),
+                    config.get("placement", "rotations_file"),
+                )
+            origin = config.get("placement", "origin", fallback="aux").lower()
+            if origin in placementOrigins:
+                self.placement_origin = origin
+            else:
+                logger.warning("Unknown placement origin %s, using aux", origin)
+            units = config.get("placement", "units", fallback="mm").lower()
+            if units in unitScales:
+                self.placement_options["units"] = units
+            else:
+                logger.warning("Unknown placement units %s, using mm", units)
+            self.placement_options["mirror_bottom"] = config.getboolean(
+                "placement", "mirror_bottom", fallback=False
+            )
+            if config.get("placement", "precision", fallback="").strip():
+                self.placement_options["precision"] = config.getint(
+                    "placement", "precision"
+                )
+            if config.has_option("bom", "group_by"):
+                self.bom_group_keys = parse_group_keys(config.get("bom", "group_by"))
+        else:
+            logger.info("plot_config FAILED " + str(plot_config))
+        return bool(plot_config)
+
+
+class Pipeline:
+    """Generate every production file of the board of process_manager.
+
+    report(percent) and stage_finished(name, status) are called as the
+    stages end. After run() the failed stages are in errors, the stages
+    skipped because of them in skipped, and the peak memory of the stages
+    in memory when it was measured.
+    """
+
+    def __init__(
+        self, process_manager, settings, logger, report=None, stage_finished=None
+    ):
+        self.process_manager = process_manager
+        self.settings = settings
+        self.logger = logger
+        self.report_progress = report
+        self.stage_finished = stage_finished
+        self.stage_cache = None
+        self.errors = {}
+        self.skipped = []
+        self.memory = {}
+
+    def report(self, status):
+        if self.report_progress is not None:
+            self.report_progress(status)
+
+    def error_summary(self):
+        """Return one message listing the failed and skipped stages."""
+        message = "Some files were not generated.\n"
+        for name, error in self.errors.items():
+            message += "\n" + name + ": " + str(error)
+        if self.skipped:
+            message += "\n\nSkipped: " + ", ".join(self.skipped)
+        return message
+
+    def run_stage(self, stage, inputs, output_dir, generate):
+        """Run generate, or restore its files if it ran before with the same inputs.
+
+        inputs is a list hashed into the key of the stage, None when they can't
+        be known and the stage always runs. generate returns the written files
+        relative to output_dir, None to not cache them.
+        """
+        key = None
+        if self.stage_cache is not None and inputs is not None:
+            key = digest(code_digest(), stage, *inputs)
+            try:
+                with span("restore " + stage, "cache"):
+                    restored = self.stage_cache.restore(stage, key, output_dir)
+                if restored is not None:
+                    self.logger.info(stage + " restored from cache")
+                    return
+            except Exception as e:
+                self.logger.error("Failed to restore %s from cache: %s" % (stage, e))
+
+        files = generate()
+        if key is not None and files is not None:
+            try:
+                with span("store " + stage, "cache"):
+                    self.stage_cache.store(stage, key, output_dir, files)
+            except Exception as e:
+                self.logger.error("Failed to cache %s: %s" % (stage, e))
+
+    def generate_in(self, path, generate, *args):
+        """Return a stage writing into the new directory path, caching all of it."""
+
+        def stage():
+            os.makedirs(path, exist_ok=True)
+            generate(path, *args)
+            return list_files(path)
+
+        return stage
+
+    def run(self):
+        """Run all stages, return the folder with the results or None.
+
+        With tracing enabled the timeline of the run is saved to the trace
+        file, relative to the board directory. The peak memory is measured
+        when it is reported or a memory budget is set.
+        """
+        tracer = Tracer() if self.settings.trace_enabled else None
+        monitor = None
+        if self.settings.memory_report or self.settings.memory_budget:
+            monitor = MemoryMonitor(trace=self.settings.memory_report)
+            monitor.start()
+
+        set_tracer(tracer)
+        try:
+            with span("run"):
+                return self.run_stages(monitor)
+        finally:
+            set_tracer(None)
+            if monitor is not None:
+                monitor.stop()
+                self.report_memory(monitor)
+            if tracer is not None:
+                self.save_trace(tracer)
+
+    def save_trace(self, tracer):
+        trace_file = os.path.join(
+            os.path.dirname(self.process_manager.board.GetFileName()),
+            self.settings.trace_file,
+        )
+        try:
+            tracer.save(trace_file)
+            self.logger.info("trace saved to " + trace_file)
+        except Exception as e:
+            self.logger.warning("Failed to save the trace %s: %s", trace_file, e)
+
+    def report_memory(self, monitor):
+        self.memory = monitor.summary()
+        for name, peak in self.memory.items():
+            self.logger.info(
+                "peak memory of %s: %s MB traced, %s MB resident",
+                name,
+                peak["traced_mb"],
+                peak["rss_mb"],
+            )
+        budget = self.settings.memory_budget
+        if budget and monitor.peak_rss() > budget:
+            self.logger.warning(
+                "Peak memory of %s MB above the budget of %s MB",
+                megabytes(monitor.peak_rss()),
+                megabytes(budget),
+            )
+
+    def run_stages(self, monitor=None):
+        project_path = self.process_manager.board.GetFileName()
+        project_name = os.path.splitext(os.path.basename(project_path))[0]
+        project_directory = os.path.dirname(self.process_manager.board.GetFileName())
+        current_time = datetime.strftime(datetime.now(), "%d-%m-%Y")
+        version = self.process_manager.get_revision(
+            self.process_manager.board.GetFileName()
+        )
+        if version is None:
+            version = "0"
+
+        outputFolder = "production_" + project_name + "_" + current_time + "_" + version
+        output_path = os.path.join(project_directory, outputFolder)
+
+        # the stages write straight into the output folder
+        delete_directory(output_path)
+
+        board = self.process_manager.board
+        board_file = board.GetFileName()
+        self.process_manager.bom_group_keys = self.settings.bom_group_keys
+        self.process_manager.rotations_file = self.settings.rotations_file
+        self.process_manager.placement_origin = self.settings.placement_origin
+        self.process_manager.placement_options = self.settings.placement_options
+        self.stage_cache = None
+        if self.settings.cache_enabled:
+            self.stage_cache = StageCache(
+                os.path.join(project_directory, cacheDir, "stages"),
+                self.settings.cache_max_size,
+            )
+
+        # under a memory budget one thing runs at a time, in this process, and
+        # what the stages share is dropped once its last reader is done
+        low_memory = bool(self.settings.memory_budget)
+        stage_workers = 0 if low_memory else self.settings.stage_workers
+        plot_workers = 0 if low_memory else self.settings.plot_workers
+        preview_workers = 0 if low_memory else self.settings.preview_workers
+        archive_workers = 1 if low_memory else self.settings.archive_workers
+
+        enabled_templates = ["Top", "Bottom"]
+        keys = {}
+
+        def prepare_board():
+            # the board is fingerprinted as plotted
+            self.process_manager.apply_gerber_settings()
+            keys["board"] = None
+            keys["layers"] = None
+            if self.stage_cache is None:
+                return
+            # formatted once for the board and the per layer fingerprints,
+            # the text is dropped when this returns
+            with span("board fingerprints", "cache"):
+                text = board_text(board)
+                if text is not None:
+                    keys["board"] = board_fingerprint(board, text)
+                    keys["layers"] = layer_fingerprints(
+                        board, [layer_info[1] for layer_info in plotPlan], text
+                    )
+
+        def board_inputs(*inputs):
+            if keys["board"] is None:
+                return None
+            return [keys["board"]] + list(inputs)
+
+        def collect_footprints():
+            keys["footprints"] = [
+                record.fields() for record in self.process_manager.collect_footprints()
+            ]
+
+        def generate_gerber():
+            path = os.path.join(output_path, gerberDir)
+            self.run_stage(
+                "gerber",
+                board_inputs(),
+                path,
+                self.generate_in(
+                    path,
+                    self.process_manager.generate_gerber,
+                    self.stage_cache,
+                    keys["layers"],
+                ),
+            )
+
+        def generate_drills():
+            path = os.path.join(output_path, drillDir)
+            self.run_stage(
+                "drill",
+                board_inputs(),
+                path,
+                self.generate_in(path, self.process_manager.generate_drills),
+            )
+
+        def generate_positions():
+            path = os.path.join(output_path, placementDir)
+            self.run_stage(
+                "positions",
+                [
+                    keys["footprints"],
+                    sorted(self.process_manager.placement_options.items()),
+                ],
+                path,
+                self.generate_in(path, self.process_manager.generate_positions),
+            )
+
+        def generate_bom():
+            path = os.path.join(output_path, bomFileDir)
+            self.run_stage(
+                "bom",
+                [
+                    keys["footprints"],
+                    self.process_manager.bom_group_keys,
+                    project_name,
+                ],
+                path,
+                self.generate_in(path, self.process_manager.generate_bom, project_name),
+            )
+
+        def generate_stackup():
+            path = os.path.join(output_path, stackFileDir)
+            self.logger.info("genarate stackup info ")
+            self.run_stage(
+                "stackup",
+                [get_board_index(board_file).section("setup"), project_name],
+                path,
+                self.generate_in(
+                    path,
+                    self.process_manager.genarate_stackup_info,
+                    board_file,
+                    project_name,
+                ),
+            )
+
+        def plot_assembly():
+            plot_inputs = board_inputs(
+                project_name,
+                layersJob,
+                enabled_templates,
+                self.settings.create_svg,
+                self.settings.plot_scale,
+                self.settings.delete_single_page_files,
+                self.settings.preview_dpis,
+                self.settings.preview_format,
+            )
+            if plot_inputs is not None and plot_workers > 1:
+                # workers plot the saved board file, with the design settings
+                # the board in the editor gets from prepare_board
+                plot_inputs.append(get_board_index(board_file).key)
+                plot_inputs.append(plotDesignSettings)
+            self.run_stage(
+                "plot",
+                plot_inputs,
+                output_path,
+                lambda: plot.plot_gerbers(
+                    board,
+                    output_path,
+                    layersJob,
+                    enabled_templates,
+                    self.settings.del_temp_files,
+                    self.settings.create_svg,
+                    self.settings.plot_scale,
+                    self.settings.delete_single_page_files,
+                    plot_workers,
+                    self.settings.preview_dpis,
+                    self.settings.preview_format,
+                    preview_workers,
+                    os.path.join(project_directory, cacheDir, "previews"),
+                    low_memory,
+                    self.settings.cache_max_size,
+                ),
+            )
+
+        # pcbnew stages run in this order, the others as soon as their
+        # inputs are ready
+        scheduler = Scheduler(stage_workers, monitor)
+        scheduler.add("board", prepare_board, outputs=["board_key"], pcbnew=True)
+        scheduler.add(
+            "footprints", collect_footprints, outputs=["footprints"], pcbnew=True
+        )
+        scheduler.add(
+            "bom_lines",
+            self.process_manager.build_bom,
+            inputs=["footprints"],
+            outputs=["bom_lines"],
+        )
+        scheduler.add(
+            "positions",
+            generate_positions,
+            inputs=["footprints", "bom_lines"],
+            outputs=[placementDir],
+        )
+        scheduler.add(
+            "bom",
+            generate_bom,
+            inputs=["footprints", "bom_lines"],
+            outputs=[bomFileDir],
+        )
+        scheduler.add("stackup", generate_stackup, outputs=[stackFileDir])
+        scheduler.add(
+            "gerber",
+            generate_gerber,
+            inputs=["board_key"],
+            outputs=[gerberDir],
+            pcbnew=True,
+        )
+        scheduler.add(
+            "drill",
+            generate_drills,
+            inputs=["board_key"],
+            outputs=[drillDir],
+            pcbnew=True,
+        )
+        scheduler.add(
+            "plot",
+            plot_assembly,
+            inputs=["board_key"],
+            outputs=["assembly"],
+            pcbnew=True,
+        )
+
+        ended = []
+
+        def stage_finished(name, status):
+            ended.append(name)
+            self.logger.info("stage " + name + " " + status)
+            if self.stage_finished is not None:
+                self.stage_finished(name, status)
+            self.report(5 + 85 * len(ended) // len(scheduler.stages))
+
+        def released(name):
+            if name == "footprints":
+                keys.pop("footprints", None)
+                self.process_manager.footprints = None
+            elif name == "bom_lines":
+                scheduler.results.pop("bom_lines", None)
+                self.process_manager.release_bom()
+            else:
+                return
+            gc.collect()
+
+        self.report(5)
+        try:
+            self.errors = scheduler.run(
+                stage_finished, released if low_memory else None
+            )
+        except Exception as e:
+            show_error(str(e))
+            return None
+        self.skipped = scheduler.skipped
+        for name, error in self.errors.items():
+            self.logger.error("stage " + name + " failed: " + str(error))
+
+        measure = nullcontext() if monitor is None else monitor.measure("archive")
+        try:
+            with span("archive"), measure:
+                write_zip(
+                    output_path + ".zip",
+                    output_path,
+                    self.settings.archive_level,
+                    archive_workers,
+                )
+        except Exception as e:
+            self.logger.error(f"Make archive failed {str(e)}")
+
+        return output_path
@@ -0,0 +1,142 @@
+"""Placement coordinates of the position file, computed for all footprints at once.
+
+place() takes one list per input, positions in nm relative to the chosen
+origin, and runs the unit conversion, Y flip, rotation offset and rotated
+position offset over NumPy arrays. Without NumPy the same operations run on
+the lists, in the same order so that both give the same file. The sine and
+cosine are taken once per distinct rotation with math, boards use a handful.
+"""
+
+import math
+
+placementOrigins = ("aux", "grid", "board")
+# nm per unit
+unitScales = {"mm": 1000000.0, "mil": 25400.0}
+
+# imported by load_numpy on the first placement, False if it isn't installed
+numpy = None
+
+
+def load_numpy():
+    """Import NumPy on first use, return the module or None without it."""
+    global numpy
+    if numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+    return numpy or None
+
+
+def place(
+    x,
+    y,
+    orientation,
+    rotation_offset,
+    offset_x,
+    offset_y,
+    bottom,
+    units="mm",
+    mirror_bottom=False,
+    precision=None,
+):
+    """Return the Mid X, Mid Y and Rotation lists of the position file.
+
+    The position offsets are in mm, like the JLCPCB Position Offset field,
+    and rotate with the footprint.
+    mirror_bottom negates Mid X of the footprints on the bottom, as seen
+    from below, and precision rounds all three to that many decimals.
+    """
+    np = load_numpy()
+    args = (x, y, orientation, rotation_offset, offset_x, offset_y, bottom)
+    options = (units, mirror_bottom, precision)
+    if np is None:
+        return place_python(*args, *options)
+    return place_numpy(np, *args, *options)
+
+
+def place_numpy(
+    np,
+    x,
+    y,
+    orientation,
+    rotation_offset,
+    offset_x,
+    offset_y,
+    bottom,
+    units="mm",
+    mirror_bottom=False,
+    precision=None,
+):
+    scale = unitScales[units]
+    mid_x = np.asarray(x, dtype=np.int64) / scale
+    mid_y = -np.asarray(y, dtype=np.int64) / scale
+    rotation = np.remainder(
+        np.asarray(orientation, dtype=float) + np.asarray(rotation_offset, dtype=float),
+        360.0,
+    )
+
+    angles, inverse = np.unique(rotation, return_inverse=True)
+    radians = [angle / 180 * math.pi for angle in angles.tolist()]
+    rsin = np.array([math.sin(angle) for angle in radians])[inverse]
+    rcos = np.array([math.cos(angle) for angle in radians])[inverse]
+    offset_x = np.asarray(offset_x, dtype=float)
+    offset_y = np.asarray(offset_y, dtype=float)
+    if units != "mm":
+        offset_x = offset_x * (unitScales["mm"] / scale)
+        offset_y = offset_y * (unitScales["mm"] / scale)
+    mid_x = mid_x + (offset_x * rcos - offset_y * rsin)
+    mid_y = mid_y + (offset_x * rsin + offset_y * rcos)
+
+    if mirror_bottom:
+        # 0.0 - keeps a part on the origin at 0.0 rather than -0.0
+        mid_x = np.where(np.asarray(bottom, dtype=bool), 0.0 - mid_x, mid_x)
+    if precision is not None:
+        factor = 10.0**precision
+        # + 0.0 turns the -0.0 of small negative values into 0.0
+        mid_x = np.rint(mid_x * factor) / factor + 0.0
+        mid_y = np.rint(mid_y * factor) / factor + 0.0
+        rotation = np.remainder(np.rint(rotation * factor) / factor, 360.0)
+    return mid_x.tolist(), mid_y.tolist(), rotation.tolist()
+
+
+def place_python(
+    x,
+    y,
+    orientation,
+    rotation_offset,
+    offset_x,
+    offset_y,
+    bottom,
+    units="mm",
+    mirror_bottom=False,
+    precision=None,
+):
+    scale = unitScales[units]
+    rotation = [
+        (angle + offset) % 360.0 for angle, offset in zip(orientation, rotation_offset)
+    ]
+    if units != "mm":
+        offset_x = [value * (unitScales["mm"] / scale) for value in offset_x]
+        offset_y = [value * (unitScales["mm"] / scale) for value in offset_y]
+    trig = {}
+    for angle in rotation:
+        if angle not in trig:
+            radians = angle / 180 * math.pi
+            trig[angle] = (math.sin(radians), math.cos(radians))
+
+    mid_x = []
+    mid_y = []
+    for i, angle in enumerate(rotation):
+        rsin, rcos = trig[angle]
+        ox, oy = offset_x[i], offset_y[i]
+        value = x[i] / scale + (ox * rcos - oy * rsin)
+        mid_x.append(0.0 - value if mirror_bottom and bottom[i] else value)
+        mid_y.append(-y[i] / scale + (ox * rsin + oy * rcos))
+
+    if precision is not None:
+        factor = 10.0**precision
+        mid_x = [round(value * factor) / factor for value in mid_x]
+        mid_y = [round(value * factor) / factor for value in mid_y]
+        rotation = [(round(value * factor) / factor) % 360.0 for value in rotation]
+    return mid_x, mid_y, rotation
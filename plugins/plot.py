@@ -1,14 +1,24 @@
 import os
 import shutil
 import pcbnew
-import wx
-import re
-import traceback
 
-try:
-    import fitz  # This imports PyMuPDF
-except:
-    pass
+from .messages import show_error
+from .plot_worker import plot_jobs, plot_jobs_parallel
+from .preview import render_previews
+from .recolor import recolor_stream
+from .svg import composite_svg
+from .tracing import span
+
+# PyMuPDF, imported by load_fitz when the first pdf is made
+fitz = None
+
+
+def load_fitz():
+    """Import PyMuPDF on first use, return the module."""
+    global fitz
+    if fitz is None:
+        import fitz
+    return fitz
 
 
 def hex_to_rgb(value):
@@ -20,98 +30,49 @@ def hex_to_rgb(value):
     return rgb
 
 
-def colorize_pdf(folder, inputFile, outputFile, color):
-    try:
-        with fitz.open(os.path.join(folder, inputFile)) as doc:
-            xref_number = doc[0].get_contents()
-            stream_bytes = doc.xref_stream(xref_number[0])
-            new_color = str(color[0]) + " " + str(color[1]) + " " + str(color[2]) + " "
-            new_color_RG = bytes(new_color + "RG", "ascii")
-            new_color_rg = bytes(new_color + "rg", "ascii")
-
-            stream_bytes = re.sub(b"0.0.0.RG", new_color_RG, stream_bytes)
-            stream_bytes = re.sub(b"0.0.0.rg", new_color_rg, stream_bytes)
-
-            doc.update_stream(xref_number[0], stream_bytes)
-            doc.save(os.path.join(folder, outputFile), clean=True)
-
-    except Exception as e:
-        wx.MessageBox(
-            "colorize_pdf failed\nOn input file "
-            + inputFile
-            + " in "
-            + folder
-            + "\n\n"
-            + str(e),
-            "Error",
-            wx.OK | wx.ICON_ERROR,
-        )
-
-
-def merge_pdf(input_folder, input_files, output_folder, output_file):
-    try:
-        output = fitz.open()
-        i = 0
-        for filename in reversed(input_files):
-            try:
-                # using "with" to force RAII and avoid another "for" closing files
-                with fitz.open(os.path.join(input_folder, filename)) as file:
-                    if i == 0:
-                        output.insert_pdf(file)
-                    else:
-                        output[0].show_pdf_page(
-                            file[0].rect,  # select output rect
-                            file,  # input document
-                            0,  # input page number
-                            overlay=False,
-                        )
-                i = i + 1
-            except Exception as e:
-                wx.MessageBox(
-                    "merge_pdf failed\n\nOn input file "
-                    + filename
-                    + " in "
-                    + input_folder
-                    + "\n\n"
-                    + str(e),
-                    "Error",
-                    wx.OK | wx.ICON_ERROR,
-                )
-
-        output.save(os.path.join(output_folder, output_file))
-
-    except Exception as e:
-        wx.MessageBox(
-            "merge_pdf failed\n\nOn output file "
-            + output_file
-            + " in "
-            + output_folder
-            + "\n\n"
-            + str(e),
-            "Error",
-            wx.OK | wx.ICON_ERROR,
-        )
+def colorize_pdf(doc, color):
+    """Recolor the black strokes and fills of every page of doc in place."""
+    done = set()
+    for page in doc:
+        for xref in page.get_contents():
+            # content streams can be shared between pages
+            if xref in done:
+                continue
+            done.add(xref)
+            stream_bytes = doc.xref_stream(xref)
+            colored = recolor_stream(stream_bytes, color)
+            if colored != stream_bytes:
+                doc.update_stream(xref, colored)
+
+
+def merge_pdf(docs):
+    """Stack the first pages of docs into a new document, the last on top."""
+    output = load_fitz().open()
+    i = 0
+    for doc in reversed(docs):
+        if i == 0:
+            output.insert_pdf(doc)
+        else:
+            output[0].show_pdf_page(
+                doc[0].rect,  # select output rect
+                doc,  # input document
+                0,  # input page number
+                overlay=False,
+            )
+        i = i + 1
+    return output
 
 
-def create_pdf_from_pages(input_folder, input_files, output_folder, output_file):
-    try:
-        output = fitz.open()
-        for filename in input_files:
-            with fitz.open(os.path.join(input_folder, filename)) as file:
-                output.insert_pdf(file)
-        output.save(os.path.join(output_folder, output_file))
-
-    except Exception as e:
-        wx.MessageBox(
-            "create_pdf_from_pages failed\n\nOn output file "
-            + output_file
-            + " in "
-            + output_folder
-            + "\n\n"
-            + str(e),
-            "Error",
-            wx.OK | wx.ICON_ERROR,
-        )
+def create_pdf_from_pages(docs):
+    """Concatenate docs, documents or pdf files, into a new document."""
+    output = load_fitz().open()
+    for doc in docs:
+        if isinstance(doc, str):
+            with fitz.open(doc) as pdf:
+                output.insert_pdf(pdf)
+        else:
+            output.insert_pdf(doc)
+    return output
 
 
 def is_number(str):
@@ -131,22 +92,31 @@ def plot_gerbers(
     create_svg,
     scale,
     del_single_page_files,
+    plot_workers=0,
+    preview_dpis=(),
+    preview_format="png",
+    preview_workers=0,
+    preview_cache_dir=None,
+    low_memory=False,
+    preview_cache_size=None,
 ):
+    """Plot the assembly drawings, return the files written to output_dir.
+
+    With low_memory every merged template is saved and closed before the
+    next one is read, Job.pdf and the previews are made from those files.
+    """
     scale_gerber = 1.0
     if is_number(scale):
         scale_gerber = float(scale)
 
     try:
-        fitz.open()
+        load_fitz().open()
     except Exception as e:
-        wx.MessageBox(
-            "PyMuPdf wasn't loaded.\n\nRun 'sudo apt install python3-fitz' " + str(e),
-            "Error",
-            wx.OK | wx.ICON_ERROR,
+        show_error(
+            "PyMuPdf wasn't loaded.\n\nRun 'sudo apt install python3-fitz' " + str(e)
         )
         return
 
-    os.chdir(os.path.dirname(board.GetFileName()))
     temp_dir = os.path.abspath(os.path.join(output_dir, "temp"))
 
     steps = 1
@@ -166,9 +136,6 @@ def plot_gerbers(
 
     progress_step = 95 // steps
 
-    plot_controller = pcbnew.PLOT_CONTROLLER(board)
-    plot_options = plot_controller.GetPlotOptions()
-
     base_filename = os.path.basename(os.path.splitext(board.GetFileName())[0])
     final_assembly_file = "Job.pdf"
     final_assembly_file_with_path = os.path.abspath(
@@ -183,20 +150,16 @@ def plot_gerbers(
         # os.access(os.path.join(output_dir, final_assembly_file), os.W_OK)
         open(os.path.join(output_dir, final_assembly_file), "w")
     except Exception as e:
-        wx.MessageBox(
+        show_error(
             "The output file is not writeable. Perhaps it's open in another "
             + "application?\n\n"
             + final_assembly_file_with_path
             + " "
-            + str(e),
-            "Error",
-            wx.OK | wx.ICON_ERROR,
+            + str(e)
         )
         progress = 100
         return
 
-    plot_options.SetOutputDirectory(temp_dir)
-
     templates_list = []
     for t in enabled_templates:
         temp = []
@@ -266,132 +229,186 @@ def plot_gerbers(
 
     template_filelist = []
 
-    # # Iterate over the templates
+    # Plot layers to pdf files
+    jobs = []
     for template in templates_list:
-        template_name = template[0]
-        # Plot layers to pdf files
         for layer_info in template[3]:
-            # dialog_panel.m_staticText_status.SetLabel("Status: Plotting " + layer_info[0] + " for template " + template_name)
-            # progress = progress + progress_step
-            # setProgress(progress)
-
-            if pcbnew.Version()[0:3] == "6.0":
-                # Should probably do this on mask layers as well
-                if pcbnew.IsCopperLayer(layer_info[1]):
-                    # NO_DRILL_SHAPE = 0, SMALL_DRILL_SHAPE = 1, FULL_DRILL_SHAPE  = 2
-                    plot_options.SetDrillMarksType(2)
-                else:
-                    # NO_DRILL_SHAPE = 0, SMALL_DRILL_SHAPE = 1, FULL_DRILL_SHAPE  = 2
-                    plot_options.SetDrillMarksType(0)
-            else:  # API changed in V6.99/V7
-                try:
-                    # Should probably do this on mask layers as well
-                    if pcbnew.IsCopperLayer(layer_info[1]):
-                        plot_options.SetDrillMarksType(
-                            pcbnew.DRILL_MARKS_FULL_DRILL_SHAPE
-                        )
-                    else:
-                        plot_options.SetDrillMarksType(
-                            pcbnew.DRILL_MARKS_NO_DRILL_SHAPE
-                        )
-                except Exception as e:
-                    wx.MessageBox(
-                        "Unable to set Drill Marks type.\n\nIf you're using a V6.99 build from before Dec 07 2022 then update to a newer build.\n\n"
-                        + str(e),
-                        "Error",
-                        wx.OK | wx.ICON_ERROR,
-                    )
-                    return
+            jobs.append(
+                {
+                    "template": template[0],
+                    "name": layer_info[0],
+                    "layer": layer_info[1],
+                    "frame": layer_info[3],
+                    "negative": layer_info[4],
+                    "mirrored": template[1],
+                    "tented": template[2],
+                    "scale": scale_gerber,
+                }
+            )
 
-            try:
-                plot_options.SetScale(1.0)
-                if not layer_info[3]:
-                    plot_options.SetScale(scale_gerber)
-                plot_options.SetPlotFrameRef(layer_info[3])
-                plot_options.SetNegative(layer_info[4])
-                plot_options.SetMirror(template[1])
-                plot_options.SetPlotViaOnMaskLayer(template[2])
-                plot_controller.SetLayer(layer_info[1])
-                plot_controller.OpenPlotfile(
-                    layer_info[0], pcbnew.PLOT_FORMAT_PDF, template_name
-                )
-                plot_controller.PlotLayer()
-            except Exception as e:
-                wx.MessageBox(str(e), "Error", wx.OK | wx.ICON_ERROR)
-                return
+    # SVGs are plotted by KiCad directly rather than converted from the pdfs
+    svg_jobs = []
+    if create_svg:
+        svg_jobs = [dict(job, format="svg") for job in jobs]
 
-        plot_controller.ClosePlot()
+    try:
+        if plot_workers > 1:
+            # workers load the board from disk, unsaved changes are not plotted
+            plotted = plot_jobs_parallel(
+                board.GetFileName(), jobs + svg_jobs, temp_dir, plot_workers
+            )
+        else:
+            plotted = plot_jobs(board, jobs + svg_jobs, temp_dir)
+    except Exception as e:
+        show_error(str(e))
+        return
 
-        filelist = []
+    svg_plotted = iter(plotted[len(jobs) :])
+
+    # outputs of a run that reported an error are not returned for caching
+    failed = False
+
+    # # Iterate over the templates
+    # The layer pdfs are read once, everything after that stays in memory
+    # until the final files are saved
+    plotted = iter(plotted[: len(jobs)])
+    template_docs = []
+    for template in templates_list:
+        docs = []
         # Change color of pdf files
         for layer_info in template[3]:
-            ln = layer_info[0].replace(".", "_")
-            inputFile = base_filename + "-" + ln + ".pdf"
-            if layer_info[2] != "#000000":
-                outputFile = base_filename + "-" + ln + "-colored.pdf"
-                colorize_pdf(temp_dir, inputFile, outputFile, hex_to_rgb(layer_info[2]))
-                filelist.append(outputFile)
-            else:
-                filelist.append(inputFile)
+            inputFile = next(plotted)
+            try:
+                doc = fitz.open(os.path.join(temp_dir, inputFile))
+                if layer_info[2] != "#000000":
+                    with span("colorize_pdf", "pdf", file=inputFile):
+                        colorize_pdf(doc, hex_to_rgb(layer_info[2]))
+                docs.append(doc)
+            except Exception as e:
+                failed = True
+                show_error(
+                    "colorize_pdf failed\nOn input file "
+                    + inputFile
+                    + " in "
+                    + temp_dir
+                    + "\n\n"
+                    + str(e)
+                )
 
         # Merge pdf files
         assembly_file = base_filename + "_" + template[0] + ".pdf"
-        merge_pdf(temp_dir, filelist, output_dir, assembly_file)
-        template_filelist.append(assembly_file)
+        try:
+            with span("merge_pdf", "pdf", file=assembly_file, layers=len(docs)):
+                merged = merge_pdf(docs)
+            if low_memory:
+                # the file bytes are what previews hash for the document
+                merged_file = os.path.join(temp_dir, assembly_file)
+                with merged:
+                    merged.save(merged_file, no_new_id=True)
+                merged = merged_file
+            template_docs.append(merged)
+            template_filelist.append(assembly_file)
+        except Exception as e:
+            failed = True
+            show_error(
+                "merge_pdf failed\n\nOn output file " + assembly_file + "\n\n" + str(e)
+            )
+        for doc in docs:
+            doc.close()
 
     # Add all generated pdfs to one file
-    create_pdf_from_pages(
-        output_dir, template_filelist, output_dir, final_assembly_file
-    )
+    try:
+        with span("save " + final_assembly_file, "pdf"), create_pdf_from_pages(
+            template_docs
+        ) as output:
+            output.save(final_assembly_file_with_path)
+    except Exception as e:
+        failed = True
+        show_error(
+            "create_pdf_from_pages failed\n\nOn output file "
+            + final_assembly_file
+            + " in "
+            + output_dir
+            + "\n\n"
+            + str(e)
+        )
 
     # Create SVG(s) if settings says so
-    if create_svg:
-        for template_file in template_filelist:
-            template_pdf = fitz.open(os.path.join(output_dir, template_file))
+    for template in templates_list if create_svg else []:
+        svg_filename = base_filename + "_" + template[0] + ".svg"
+        layers = [
+            (layer_info[0], os.path.join(temp_dir, next(svg_plotted)), layer_info[2])
+            for layer_info in template[3]
+        ]
+        try:
+            with span("composite_svg", "svg", file=svg_filename):
+                composite_svg(layers, os.path.join(output_dir, svg_filename))
+        except Exception as e:
+            failed = True
+            show_error("Failed to create SVG in " + output_dir + "\n\n" + str(e))
+
+    # Raster previews of the merged templates, cached between runs
+    preview_files = []
+    if preview_dpis:
+        try:
+            with span("previews", "preview", dpis=list(preview_dpis)):
+                preview_files = render_previews(
+                    [
+                        (os.path.splitext(template_file)[0], template_pdf)
+                        for template_file, template_pdf in zip(
+                            template_filelist, template_docs
+                        )
+                    ],
+                    output_dir,
+                    preview_cache_dir or os.path.join(temp_dir, "previews"),
+                    preview_dpis,
+                    preview_format,
+                    preview_workers,
+                    preview_cache_size,
+                )
+        except Exception as e:
+            failed = True
+            show_error("Failed to create previews in " + output_dir + "\n\n" + str(e))
+
+    for template_file, template_pdf in zip(template_filelist, template_docs):
+        # Keep single page files unless setting says so
+        if not del_single_page_files:
             try:
-                svg_image = template_pdf[0].get_svg_image()
-                svg_filename = os.path.splitext(template_file)[0] + ".svg"
-                file = open(os.path.join(output_dir, svg_filename), "w")
-                file.write(svg_image)
-                file.close()
+                if isinstance(template_pdf, str):
+                    shutil.copyfile(
+                        template_pdf, os.path.join(output_dir, template_file)
+                    )
+                else:
+                    template_pdf.save(os.path.join(output_dir, template_file))
             except Exception as e:
-                wx.MessageBox(
-                    "Failed to create SVG in " + output_dir + "\n\n" + str(e),
-                    "Error",
-                    wx.OK | wx.ICON_ERROR,
+                failed = True
+                show_error(
+                    "Saving single page file failed\n\nOn file "
+                    + template_file
+                    + " in "
+                    + output_dir
+                    + "\n\n"
+                    + str(e)
                 )
-                progress = 100
-                setProgress(progress)
+        if not isinstance(template_pdf, str):
             template_pdf.close()
 
+    output_files = [final_assembly_file]
+    if not del_single_page_files:
+        output_files.extend(template_filelist)
+    if create_svg:
+        output_files.extend(
+            os.path.splitext(template_file)[0] + ".svg"
+            for template_file in template_filelist
+        )
+    output_files.extend(preview_files)
+
     # Delete temp files if setting says so
     if del_temp_files:
         try:
             shutil.rmtree(temp_dir)
         except Exception as e:
-            wx.MessageBox(
-                "del_temp_files failed\n\nOn dir " + temp_dir + "\n\n" + str(e),
-                "Error",
-                wx.OK | wx.ICON_ERROR,
-            )
-
-    # Delete single page files if setting says so
-    if del_single_page_files:
-        for template_file in template_filelist:
-            delete_file = os.path.join(
-                output_dir, os.path.splitext(template_file)[0] + ".pdf"
-            )
-            try:
-                os.remove(delete_file)
-            except Exception as e:
-                wx.MessageBox(
-                    "del_single_page_files failed\n\nOn file "
-                    + delete_file
-                    + "\n\n"
-                    + str(e),
-                    "Error",
-                    wx.OK | wx.ICON_ERROR,
-                )
+            show_error("del_temp_files failed\n\nOn dir " + temp_dir + "\n\n" + str(e))
 
     endmsg = "All done!\n\nAssembly pdf created: " + os.path.abspath(
         os.path.join(output_dir, final_assembly_file)
@@ -421,3 +438,12 @@ def plot_gerbers(
                     )
                 )
             )
+
+    if preview_files:
+        endmsg = endmsg + "\n\nPreviews created:"
+        for preview_file in preview_files:
+            endmsg = (
+                endmsg + "\n" + os.path.abspath(os.path.join(output_dir, preview_file))
+            )
+
+    return None if failed else output_files
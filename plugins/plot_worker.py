@@ -0,0 +1,161 @@
+"""Plot assembly drawing layers to pdf or svg files.
+
+The module only depends on pcbnew so it can also run as a script in a worker
+process, where it loads the board with pcbnew.LoadBoard and plots the jobs
+read as json from stdin:
+
+    python plot_worker.py board.kicad_pcb output_dir < jobs.json
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+import pcbnew
+
+if __package__:
+    from .tracing import span
+else:
+    # a worker process, the parent traces the whole worker
+
+    def span(name, category="run", **args):
+        return nullcontext()
+
+
+# board design settings the Gerber and assembly layers are plotted with, set
+# on the board in the PCB Editor and on the board a worker loads alike
+plotDesignSettings = {"m_SolderMaskMargin": 0, "m_SolderMaskMinWidth": 0}
+
+
+def apply_design_settings(board):
+    settings = board.GetDesignSettings()
+    for name, value in plotDesignSettings.items():
+        setattr(settings, name, value)
+
+
+def set_drill_marks(plot_options, layer):
+    if pcbnew.Version()[0:3] == "6.0":
+        # Should probably do this on mask layers as well
+        if pcbnew.IsCopperLayer(layer):
+            # NO_DRILL_SHAPE = 0, SMALL_DRILL_SHAPE = 1, FULL_DRILL_SHAPE  = 2
+            plot_options.SetDrillMarksType(2)
+        else:
+            # NO_DRILL_SHAPE = 0, SMALL_DRILL_SHAPE = 1, FULL_DRILL_SHAPE  = 2
+            plot_options.SetDrillMarksType(0)
+    else:  # API changed in V6.99/V7
+        try:
+            # Should probably do this on mask layers as well
+            if pcbnew.IsCopperLayer(layer):
+                plot_options.SetDrillMarksType(pcbnew.DRILL_MARKS_FULL_DRILL_SHAPE)
+            else:
+                plot_options.SetDrillMarksType(pcbnew.DRILL_MARKS_NO_DRILL_SHAPE)
+        except Exception as e:
+            raise RuntimeError(
+                "Unable to set Drill Marks type.\n\nIf you're using a V6.99 build from before Dec 07 2022 then update to a newer build.\n\n"
+                + str(e)
+            )
+
+
+def plot_layer(plot_controller, job):
+    """Plot one (template, layer) job and return the pdf or svg file name."""
+    plot_options = plot_controller.GetPlotOptions()
+    set_drill_marks(plot_options, job["layer"])
+
+    plot_options.SetScale(1.0)
+    if not job["frame"]:
+        plot_options.SetScale(job["scale"])
+    plot_options.SetPlotFrameRef(job["frame"])
+    plot_options.SetNegative(job["negative"])
+    plot_options.SetMirror(job["mirrored"])
+    plot_options.SetPlotViaOnMaskLayer(job["tented"])
+    plot_controller.SetLayer(job["layer"])
+    # the template is part of the name, templates share layers like Edge.Cuts
+    plot_format = pcbnew.PLOT_FORMAT_PDF
+    if job.get("format") == "svg":
+        plot_format = pcbnew.PLOT_FORMAT_SVG
+    plot_controller.OpenPlotfile(
+        job["template"] + "-" + job["name"], plot_format, job["template"]
+    )
+    plot_controller.PlotLayer()
+    return os.path.basename(plot_controller.GetPlotFileName())
+
+
+def plot_jobs(board, jobs, output_dir):
+    """Plot the jobs in order, return their file names."""
+    plot_controller = pcbnew.PLOT_CONTROLLER(board)
+    plot_controller.GetPlotOptions().SetOutputDirectory(output_dir)
+    files = []
+    for job in jobs:
+        with span(
+            job["template"] + "-" + job["name"], "plot", format=job.get("format", "pdf")
+        ):
+            files.append(plot_layer(plot_controller, job))
+    plot_controller.ClosePlot()
+    return files
+
+
+def python_executable():
+    """Return a python interpreter, sys.executable is KiCad inside the PCB Editor."""
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    candidates = [
+        os.path.join(os.path.dirname(sys.executable), "python.exe"),
+        os.path.join(sys.exec_prefix, "python.exe"),
+        os.path.join(sys.exec_prefix, "bin", "python3"),
+    ]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return shutil.which("python3") or shutil.which("python")
+
+
+def run_worker(board_file, jobs, output_dir):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+    result = subprocess.run(
+        [python_executable(), os.path.abspath(__file__), board_file, output_dir],
+        input=json.dumps(jobs),
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError("Plot worker failed\n\n" + result.stderr[-2000:])
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def plot_jobs_parallel(board_file, jobs, output_dir, workers):
+    """Plot the jobs of the saved board_file on up to workers processes.
+
+    Every worker loads the board once and plots a contiguous slice of jobs,
+    the file names are returned in job order whatever finishes first.
+    """
+    if not jobs:
+        return []
+    workers = max(1, min(workers, len(jobs)))
+    size = -(-len(jobs) // workers)
+    slices = [jobs[i : i + size] for i in range(0, len(jobs), size)]
+    with ThreadPoolExecutor(max_workers=len(slices)) as executor:
+
+        def run_slice(jobs):
+            with span("plot worker", "plot", jobs=len(jobs)):
+                return run_worker(board_file, jobs, output_dir)
+
+        results = executor.map(run_slice, slices)
+        return [name for files in results for name in files]
+
+
+def main():
+    board = pcbnew.LoadBoard(sys.argv[1])
+    apply_design_settings(board)
+    jobs = json.load(sys.stdin)
+    files = plot_jobs(board, jobs, sys.argv[2])
+    print(json.dumps(files))
+
+
+if __name__ == "__main__":
+    main()
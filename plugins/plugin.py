@@ -2,14 +2,17 @@ import pcbnew
 import wx
 import os
 
-from .thread import ProcessThread
 from .events import StatusEvent
-from .logs import LoggerConfig
 
 
 class ProgressDialog(wx.Frame):
     def __init__(self):
-        self.logger = LoggerConfig()
+        # the generator and its dependencies load on the first run, not
+        # when the PCB Editor registers the plugin
+        from .logs import get_logger
+        from .thread import ProcessThread
+
+        self.logger = get_logger(pcbnew.GetBoard().GetFileName())
 
         wx.Dialog.__init__(
             self,
@@ -0,0 +1,117 @@
+"""Raster previews of the merged assembly templates.
+
+Previews are cached by the sha256 of the template pdf, a template that did
+not change since the last run is copied from the cache instead of rendered.
+PyMuPDF must not be used from several threads, so the thread pool only
+drives worker processes running this module as a script:
+
+    python preview.py template.pdf dpi output.png
+"""
+
+import os
+import sys
+import shutil
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+previewFormats = ("png", "webp")
+
+
+def render(pdf_file, dpi, output_file):
+    """Render the first page of pdf_file to a png or webp (needs Pillow) file."""
+    import fitz
+
+    with fitz.open(pdf_file) as doc:
+        pix = doc[0].get_pixmap(dpi=dpi)
+    # write next to the target first, an interrupted render is never a cache hit
+    temp_file = output_file + ".part"
+    if output_file.endswith(".webp"):
+        pix.pil_save(temp_file, format="WEBP")
+    else:
+        pix.save(temp_file, output="png")
+    os.replace(temp_file, output_file)
+
+
+def run_worker(pdf_file, dpi, output_file):
+    from .plot_worker import python_executable
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+    result = subprocess.run(
+        [
+            python_executable(),
+            os.path.abspath(__file__),
+            pdf_file,
+            str(dpi),
+            output_file,
+        ],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError("Preview worker failed\n\n" + result.stderr[-2000:])
+
+
+def render_previews(
+    templates, output_dir, cache_dir, dpis, image_format, workers=0, max_size=None
+):
+    """Write a preview of every (name, fitz document or pdf file) at every dpi.
+
+    Missing previews are rendered on up to workers processes, or in this
+    process when workers is below 2. The least recently used previews are
+    removed from cache_dir once it holds more than max_size bytes. Returns
+    the preview file names.
+    """
+    from .cache import trim_directory
+
+    if image_format not in previewFormats:
+        raise ValueError("Unsupported preview format " + image_format)
+    os.makedirs(cache_dir, exist_ok=True)
+    jobs = []
+    pdf_files = []
+    outputs = []
+    for name, doc in templates:
+        if isinstance(doc, str):
+            with open(doc, "rb") as f:
+                data = f.read()
+        else:
+            # without a new /ID the bytes are the same for the same content
+            data = doc.tobytes(no_new_id=True)
+        digest = hashlib.sha256(data).hexdigest()
+        pdf_file = None
+        for dpi in dpis:
+            cached = os.path.join(cache_dir, "%s-%d.%s" % (digest, dpi, image_format))
+            if os.path.isfile(cached):
+                # the mtime orders the previews for trim_directory
+                os.utime(cached)
+            elif cached not in (j[2] for j in jobs):
+                if pdf_file is None:
+                    pdf_file = os.path.join(cache_dir, digest + ".pdf")
+                    with open(pdf_file, "wb") as f:
+                        f.write(data)
+                    pdf_files.append(pdf_file)
+                jobs.append((pdf_file, dpi, cached))
+            outputs.append((cached, "%s_%ddpi.%s" % (name, dpi, image_format)))
+
+    try:
+        if workers > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+                list(executor.map(lambda job: run_worker(*job), jobs))
+        else:
+            for job in jobs:
+                render(*job)
+    finally:
+        for pdf_file in pdf_files:
+            os.remove(pdf_file)
+
+    for cached, preview_file in outputs:
+        shutil.copyfile(cached, os.path.join(output_dir, preview_file))
+    if max_size is not None:
+        trim_directory(cache_dir, max_size)
+    return [preview_file for _, preview_file in outputs]
+
+
+if __name__ == "__main__":
+    render(sys.argv[1], int(sys.argv[2]), sys.argv[3])
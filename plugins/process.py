@@ -4,35 +4,43 @@ from __future__ import annotations
 # System base libraries
 import os
 import csv
-import math
-import shutil
 from collections import defaultdict
 import re
-import pandas as pd
 
 # Interaction with KiCad.
 import pcbnew
 
 # Application definitions.
 from .config import plotPlan, placementFileName, netlistFileName
-import wx
-
-term_regex = r"""(?mx)
-    \s*(?:
-        (?P<brackl>\()|
-        (?P<brackr>\))|
-        (?P<num>\-?\d+\.\d+|\-?\d+)|
-        (?P<sq>"[^"]*")|
-        (?P<s>[^(^)\s]+)
-       )"""
+from .board import get_board_index
+from .bom import BomGrouper
+from .cache import code_digest, digest
+from .export import write_table
+from .footprints import FootprintRecord
+from .messages import show_error
+from .placement import place
+from .plot_worker import apply_design_settings
+from .rotations import load_rotations, rotationsFile
+from .tracing import span
+from . import sexp
 
 
 class ProcessManager:
-    def __init__(self, log):
+    def __init__(self, log, board=None):
         self.logger = log
-        self.board = pcbnew.GetBoard()
+        # the board open in the PCB Editor unless one is given
+        self.board = board if board is not None else pcbnew.GetBoard()
         self.bom = []
+        self.bom_group_keys = None
+        self.bom_index = BomGrouper()
+        self.footprints = None
         self.components = []
+        # rotation offsets of footprints without the field, None to not use any
+        self.rotations_file = rotationsFile
+        # "aux", "grid" or "board", the corner of the board outline
+        self.placement_origin = "aux"
+        # the units, mirror_bottom and precision of placement.place
+        self.placement_options = {}
 
     def is_number(self, str):
         try:
@@ -47,11 +55,29 @@ class ProcessManager:
             num = float(string)
         return num
 
-    def generate_gerber(self, temp_dir):
-        """Generate the Gerber files."""
-        settings = self.board.GetDesignSettings()
-        settings.m_SolderMaskMargin = 0
-        settings.m_SolderMaskMinWidth = 0
+    def apply_gerber_settings(self):
+        """Set the board design settings the Gerber files are plotted with."""
+        apply_design_settings(self.board)
+
+    def generate_gerber(self, temp_dir, stage_cache=None, fingerprints=None):
+        """Generate the Gerber files.
+
+        With a stage_cache and the layer_fingerprints of the board only the
+        layers whose fingerprint changed since the last run are plotted, the
+        files of the others are restored.
+        """
+        self.apply_gerber_settings()
+
+        layer_keys = {}
+        if stage_cache is not None and fingerprints:
+            board_name = os.path.basename(self.board.GetFileName())
+            for layer_info in plotPlan:
+                layer_keys[layer_info[1]] = digest(
+                    code_digest(),
+                    layer_info[0],
+                    board_name,
+                    fingerprints[layer_info[1]],
+                )
 
         plot_controller = pcbnew.PLOT_CONTROLLER(self.board)
 
@@ -71,16 +97,35 @@ class ProcessManager:
         if hasattr(plot_options, "SetExcludeEdgeLayer"):
             plot_options.SetExcludeEdgeLayer(True)
 
+        plotted = []
         for layer_info in plotPlan:
             if self.board.IsLayerEnabled(layer_info[1]):
-                plot_controller.SetLayer(layer_info[1])
-                plot_controller.OpenPlotfile(
-                    layer_info[0], pcbnew.PLOT_FORMAT_GERBER, layer_info[2]
-                )
-                plot_controller.PlotLayer()
+                key = layer_keys.get(layer_info[1])
+                if key is not None:
+                    with span("restore " + layer_info[0], "cache"):
+                        restored = stage_cache.restore("gerber-layer", key, temp_dir)
+                    if restored is not None:
+                        continue
+                with span(layer_info[0], "gerber"):
+                    plot_controller.SetLayer(layer_info[1])
+                    plot_controller.OpenPlotfile(
+                        layer_info[0], pcbnew.PLOT_FORMAT_GERBER, layer_info[2]
+                    )
+                    plot_controller.PlotLayer()
+                plotted.append((key, plot_controller.GetPlotFileName()))
 
         plot_controller.ClosePlot()
 
+        # files are complete once the plot is closed
+        for key, plot_file in plotted:
+            if key is not None:
+                try:
+                    stage_cache.store(
+                        "gerber-layer", key, temp_dir, [os.path.basename(plot_file)]
+                    )
+                except Exception as e:
+                    self.logger.error("Failed to cache %s: %s" % (plot_file, e))
+
     def generate_drills(self, temp_dir):
         """Generate the drill file."""
         drill_writer = pcbnew.EXCELLON_WRITER(self.board)
@@ -96,166 +141,208 @@ class ProcessManager:
         netlist_writer = pcbnew.IPC356D_WRITER(self.board)
         netlist_writer.Write(os.path.join(temp_dir, netlistFileName))
 
-    def generate_positions(self, temp_dir):
-        """Generate the position files."""
+    def collect_footprints(self):
+        """Read every footprint once into a FootprintRecord, sorted by reference."""
         if hasattr(self.board, "GetModules"):
             footprints = list(self.board.GetModules())
         else:
             footprints = list(self.board.GetFootprints())
 
+        origin = self._get_placement_origin()
+        origin_x, origin_y = origin[0], origin[1]
+        layers = {
+            pcbnew.F_Cu: "top",
+            pcbnew.B_Cu: "bottom",
+        }
+        exclude_from_pos = pcbnew.FP_EXCLUDE_FROM_POS_FILES
+        exclude_from_bom = pcbnew.FP_EXCLUDE_FROM_BOM
+        rotations = None
+        if self.rotations_file:
+            # the database is only a fallback, the footprints are read without it
+            try:
+                rotations = load_rotations(self.rotations_file)
+            except (OSError, ValueError, re.error) as e:
+                self.logger.error(
+                    "Failed to load the rotations %s: %s" % (self.rotations_file, e)
+                )
+
+        records = []
+        for footprint in footprints:
+            reference = footprint.GetReference()
+            fpid = footprint.GetFPID()
+            try:
+                footprint_name = str(fpid.GetFootprintName())
+            except AttributeError:
+                footprint_name = str(fpid.GetLibItemName())
+            position = footprint.GetPosition()
+            orientation = footprint.GetOrientation()
+            attributes = footprint.GetAttributes()
+
+            record = FootprintRecord(
+                reference,
+                footprint_name,
+                footprint.GetValue(),
+                layers.get(footprint.GetLayer()),
+                attributes,
+                position[0] - origin_x,
+                position[1] - origin_y,
+                (
+                    orientation.AsDegrees()
+                    if hasattr(orientation, "AsDegrees")
+                    else orientation / 10.0
+                ),
+            )
+            record.in_pos = not attributes & exclude_from_pos
+            record.in_bom = not attributes & exclude_from_bom
+
+            if record.in_pos:
+                # Get the rotation offset to be added to the actual rotation prioritizing the explicated by the
+                # designer at the standards symbol fields. If not specified use the internal database.
+                offset = self._get_rotation_offset_from_footprint(footprint)
+                if offset is None and rotations is not None:
+                    offset = rotations.offset(
+                        str(fpid.GetLibNickname()), footprint_name
+                    )
+                record.rotation_offset = offset or 0
+                record.position_offset = self._get_position_offset_from_footprint(
+                    footprint
+                )
+
+            if record.in_bom:
+                try:
+                    record.dnp = self._is_dnp(footprint)
+                    record.mfr_pn = self._get_mfr_pn_from_footprint(footprint)
+                    record.mfr_name = self._get_mfr_name_from_footprint(footprint)
+                    record.lcsc_pn = self._get_lcsc_pn_from_footprint(footprint)
+                    record.link = self._get_link_from_footprint(footprint)
+                    record.unit_price = self._get_unit_price_from_footprint(footprint)
+                except Exception as e:
+                    record.in_bom = False
+                    self.logger.error(f"footprint - {reference} {str(e)}")
+                    show_error(f"footprint - {reference} {str(e)}")
+
+            records.append(record)
+
         # sort footprint after designator
-        footprints.sort(key=lambda x: x.GetReference())
+        records.sort(key=lambda x: x.reference)
+        self.footprints = records
+        return records
+
+    def build_bom(self):
+        """Group the footprint records into BOM lines."""
+        if self.footprints is None:
+            self.collect_footprints()
+
+        # unique designator dictionary
+        bom_designators = defaultdict(int)
+        for footprint in self.footprints:
+            bom_designators[footprint.reference] += 1
+        bom_grouper = BomGrouper(self.bom_group_keys)
+
+        for footprint in self.footprints:
+            if not footprint.in_bom:
+                continue
+            # append unique ID if we are dealing with duplicate bom designator
+            unique_id = ""
+            if bom_designators[footprint.reference] > 1:
+                unique_id = str(bom_designators[footprint.reference])
+                bom_designators[footprint.reference] -= 1
+
+            designator = "{}{}{}".format(
+                footprint.reference, "" if unique_id == "" else "_", unique_id
+            )
+
+            # add component to BOM, similar parts are merged into one entry
+            bom_grouper.add(
+                designator,
+                {
+                    "Designator": designator,
+                    "Footprint": self._normalize_footprint_name(footprint.name),
+                    "Value": footprint.value,
+                    # 'Mount': mount_type,
+                    "Mfr_Part_Number": footprint.mfr_pn,
+                    "Mfr_Name": footprint.mfr_name,
+                    "Quantity": 1,
+                    "LCSC_Part": footprint.lcsc_pn,
+                    "Link": footprint.link,
+                    "Unit price": footprint.unit_price,
+                    "Total price": self.to_float(footprint.unit_price),
+                },
+                footprint.dnp,
+            )
+
+        self.bom = bom_grouper.rows()
+        self.bom_index = bom_grouper
+        return self.bom
+
+    def release_bom(self):
+        """Drop the BOM lines and positions once their files are written."""
+        self.bom = []
+        self.bom_index = BomGrouper()
+        self.components = []
+
+    def generate_positions(self, temp_dir):
+        """Generate the position files."""
+        if self.footprints is None:
+            self.collect_footprints()
+        if not self.bom_index.lines:
+            self.build_bom()
 
         # unique designator dictionary
         footprint_designators = defaultdict(int)
-        for i, footprint in enumerate(footprints):
+        for footprint in self.footprints:
             # count unique designators
-            footprint_designators[footprint.GetReference()] += 1
-        bom_designators = footprint_designators.copy()
+            footprint_designators[footprint.reference] += 1
 
         # if len(footprint_designators.items()) > 0:
         #     with open((os.path.join(temp_dir, designatorsFileName)), 'w', encoding='utf-8') as f:
         #         for key, value in footprint_designators.items():
         #             f.write('%s:%s\n' % (key, value))
 
-        for i, footprint in enumerate(footprints):
-            try:
-                footprint_name = str(footprint.GetFPID().GetFootprintName())
-            except AttributeError:
-                footprint_name = str(footprint.GetFPID().GetLibItemName())
-
-            layer = {
-                pcbnew.F_Cu: "top",
-                pcbnew.B_Cu: "bottom",
-            }.get(footprint.GetLayer())
-
+        designators = []
+        layers = []
+        inputs = [[] for _ in range(7)]
+        x, y, orientation, rotation_offset, offset_x, offset_y, bottom = inputs
+        for footprint in self.footprints:
             # mount_type = {
             #     0: 'smt',
             #     1: 'tht',
             #     2: 'smt'
-            # }.get(footprint.GetAttributes())
+            # }.get(footprint.attributes)
 
-            if not footprint.GetAttributes() & pcbnew.FP_EXCLUDE_FROM_POS_FILES:
+            if footprint.in_pos:
                 # append unique ID if duplicate footprint designator
                 unique_id = ""
-                if footprint_designators[footprint.GetReference()] > 1:
-                    unique_id = str(footprint_designators[footprint.GetReference()])
-                    footprint_designators[footprint.GetReference()] -= 1
+                if footprint_designators[footprint.reference] > 1:
+                    unique_id = str(footprint_designators[footprint.reference])
+                    footprint_designators[footprint.reference] -= 1
 
-                designator = "{}{}{}".format(
-                    footprint.GetReference(), "" if unique_id == "" else "_", unique_id
-                )
-                mid_x = (
-                    footprint.GetPosition()[0]
-                    - self.board.GetDesignSettings().GetAuxOrigin()[0]
-                ) / 1000000.0
-                mid_y = (
-                    (
-                        footprint.GetPosition()[1]
-                        - self.board.GetDesignSettings().GetAuxOrigin()[1]
+                designators.append(
+                    "{}{}{}".format(
+                        footprint.reference, "" if unique_id == "" else "_", unique_id
                     )
-                    * -1.0
-                    / 1000000.0
-                )
-                rotation = (
-                    footprint.GetOrientation().AsDegrees()
-                    if hasattr(footprint.GetOrientation(), "AsDegrees")
-                    else footprint.GetOrientation() / 10.0
                 )
-                # Get the rotation offset to be added to the actual rotation prioritizing the explicated by the
-                # designer at the standards symbol fields. If not specified use the internal database.
-                rotation_offset = self._get_rotation_offset_from_footprint(
-                    footprint
-                )  # or self._get_rotation_from_db(footprint)
-                rotation = (rotation + rotation_offset) % 360.0
-
-                # position offset needs to take rotation into account
-                pos_offset = self._get_position_offset_from_footprint(footprint)
-                rsin = math.sin(rotation / 180 * math.pi)
-                rcos = math.cos(rotation / 180 * math.pi)
-                pos_offset = (
-                    pos_offset[0] * rcos - pos_offset[1] * rsin,
-                    pos_offset[0] * rsin + pos_offset[1] * rcos,
-                )
-                mid_x, mid_y = tuple(map(sum, zip((mid_x, mid_y), pos_offset)))
-
-                self.components.append(
-                    {
-                        "Designator": designator,
-                        "Mid X": mid_x,
-                        "Mid Y": mid_y,
-                        "Rotation": rotation,
-                        "Layer": layer,
-                    }
-                )
-
-            if not footprint.GetAttributes() & pcbnew.FP_EXCLUDE_FROM_BOM:
-                # append unique ID if we are dealing with duplicate bom designator
-                unique_id = ""
-                if bom_designators[footprint.GetReference()] > 1:
-                    unique_id = str(bom_designators[footprint.GetReference()])
-                    bom_designators[footprint.GetReference()] -= 1
-
-                # merge similar parts into single entry
-                insert = True
-                for component in self.bom:
-                    if component["Mfr_Part_Number"] == self._get_mfr_pn_from_footprint(
-                        footprint
-                    ):
-                        component["Designator"] += ", " + "{}{}{}".format(
-                            footprint.GetReference(),
-                            "" if unique_id == "" else "_",
-                            unique_id,
-                        )
-                        component["Quantity"] += 1
-                        component["Total price"] += self.to_float(
-                            component["Unit price"]
-                        )
-                        insert = False
-
-                # add component to BOM
-                try:
-                    if insert:
-                        self.bom.append(
-                            {
-                                "Designator": "{}{}{}".format(
-                                    footprint.GetReference(),
-                                    "" if unique_id == "" else "_",
-                                    unique_id,
-                                ),
-                                "Footprint": self._normalize_footprint_name(
-                                    footprint_name
-                                ),
-                                "Value": footprint.GetValue(),
-                                # 'Mount': mount_type,
-                                "Mfr_Part_Number": self._get_mfr_pn_from_footprint(
-                                    footprint
-                                ),
-                                "Mfr_Name": self._get_mfr_name_from_footprint(
-                                    footprint
-                                ),
-                                "Quantity": 1,
-                                "LCSC_Part": self._get_lcsc_pn_from_footprint(
-                                    footprint
-                                ),
-                                "Link": self._get_link_from_footprint(footprint),
-                                "Unit price": self._get_unit_price_from_footprint(
-                                    footprint
-                                ),
-                                "Total price": self.to_float(
-                                    self._get_unit_price_from_footprint(footprint)
-                                ),
-                            }
-                        )
-                except Exception as e:
-                    self.logger.error(
-                        f"footprint - {footprint.GetReference()} {str(e)}"
-                    )
-                    wx.MessageBox(
-                        f"footprint - {footprint.GetReference()} {str(e)}",
-                        "Error",
-                        wx.OK | wx.ICON_ERROR,
-                    )
+                x.append(footprint.x)
+                y.append(footprint.y)
+                orientation.append(footprint.orientation)
+                rotation_offset.append(footprint.rotation_offset)
+                offset_x.append(footprint.position_offset[0])
+                offset_y.append(footprint.position_offset[1])
+                bottom.append(footprint.layer == "bottom")
+                layers.append(footprint.layer)
+
+        # position offsets need to take rotation into account
+        mid_x, mid_y, rotation = place(*inputs, **self.placement_options)
+        for i, designator in enumerate(designators):
+            self.components.append(
+                {
+                    "Designator": designator,
+                    "Mid X": mid_x[i],
+                    "Mid Y": mid_y[i],
+                    "Rotation": rotation[i],
+                    "Layer": layers[i],
+                }
+            )
 
         if len(self.components) > 0:
             with open(
@@ -271,124 +358,64 @@ class ProcessManager:
                 for component in self.components:
                     # writing data of CSV file
                     if "**" not in component["Designator"]:
-                        # Check if component's designator exists in any of the BOM designator strings
-                        found = False
-                        for bom_item in self.bom:
-                            if component["Designator"] in bom_item["Designator"].split(
-                                ", "
-                            ):
-                                found = True
-                                break
-
-                        if found:
+                        if self.bom_index.is_placed(component["Designator"]):
                             csv_writer.writerow(component.values())
 
+            placed = [component["Designator"] for component in self.components]
+            missing = self.bom_index.missing_from_bom(placed)
+            if missing:
+                self.logger.info("Not in the BOM: " + ", ".join(missing))
+            unplaced = self.bom_index.without_placement(placed)
+            if unplaced:
+                self.logger.info("Without placement: " + ", ".join(unplaced))
+
     def generate_bom(self, temp_dir, project_name):
         name = os.path.join(temp_dir, "Bill of Materials-" + project_name)
-        bom_path = os.path.join(temp_dir, name + ".csv")
-
-        if len(self.bom) > 0:
-            with open(bom_path, "w", newline="", encoding="utf-8") as outfile:
-                csv_writer = csv.writer(outfile)
-                # writing headers of CSV file
-                csv_writer.writerow(self.bom[0].keys())
+        if not self.bom_index.lines:
+            self.build_bom()
+
+        with span("bom files", "bom", lines=len(self.bom)):
+            write_table(
+                self.bom,
+                name + ".csv",
+                name + ".xlsx",
+                "BOM",
+                na_rep="NaN",
+                skip=lambda component: "**" in component["Designator"],
+            )
 
-                # Output all of the component information
-                for component in self.bom:
-                    # writing data of CSV file
-                    if "**" not in component["Designator"]:
-                        csv_writer.writerow(component.values())
-
-            writer = pd.ExcelWriter(name + ".xlsx")
-            read_file = pd.read_csv(bom_path)
-            read_file.to_excel(writer, sheet_name="BOM", index=False, na_rep="NaN")
-            for column in read_file:
-                column_width = max(
-                    read_file[column].astype(str).map(len).max(), len(column)
-                )
-                col_idx = read_file.columns.get_loc(column)
-                writer.sheets["BOM"].set_column(col_idx, col_idx, column_width)
-
-            writer.close()
-
-    def parse_sexp(self, sexp):
-        # index = sexp.find("stackup", 0)
-        # index_end = sexp.find("copper_finish", index)
-        # print(str(index))
-        # return " "
-        stack = []
-        out = []
-        dbg = False
-
-        if dbg:
-            print("%-6s %-14s %-44s %-s" % tuple("term value out stack".split()))
-        for termtypes in re.finditer(term_regex, sexp):
-            # wx.MessageBox(str(termtypes), "OK", wx.OK)
-            term, value = [(t, v) for t, v in termtypes.groupdict().items() if v][0]
-            if dbg:
-                print("%-7s %-14s %-44r %-r" % (term, value, out, stack))
-            if term == "brackl":
-                stack.append(out)
-                out = []
-            elif term == "brackr":
-                assert stack, "Trouble with nesting of brackets"
-                tmpout, out = out, stack.pop(-1)
-                out.append(tmpout)
-            elif term == "num":
-                v = float(value)
-                if v.is_integer():
-                    v = int(v)
-                out.append(v)
-            elif term == "sq":
-                out.append(value[1:-1])
-            elif term == "s":
-                out.append(value)
-            else:
-                raise NotImplementedError("Error: %r" % (term, value))
-        assert not stack, "Trouble with nesting of brackets"
-        return out[0]
+    def parse_sexp(self, data):
+        """Parse a whole S-expression, prefer sexp.find_sections for lookups."""
+        return sexp.parse(data)
 
     def get_stackup_info(self, board_file):
         keys = ["Layer", "Name", "Material", "Thickness", "Color"]
         layers = []
-        with open(board_file, "rb") as f:
-            data = f.read()
-
-            sexp = self.parse_sexp(data.decode("utf-8"))
-            stackup = ""
-            for e in sexp:
-                if e[0] == "setup":
-                    stackup = e[1]
-                    break
-
-            count = 0
-
-            for layer in stackup:
-                if isinstance(layer, list) and layer[0] == "layer":
-                    count += 1
-                    layer_dict = dict.fromkeys(keys)
-                    layer_dict["Layer"] = count
-                    for properties in layer[1:]:
-                        if properties[0] == "type":
-                            layer_dict["Name"] = properties[1]
-                        if properties[0] == "color":
-                            layer_dict["Color"] = properties[1]
-                        if properties[0] == "thickness":
-                            layer_dict["Thickness"] = properties[1]
-                        if properties[0] == "material":
-                            layer_dict["Material"] = properties[1]
-                    layers.append(layer_dict)
+        stackup = get_board_index(board_file).stackup()
+
+        count = 0
+
+        for layer in stackup:
+            if isinstance(layer, list) and layer[0] == "layer":
+                count += 1
+                layer_dict = dict.fromkeys(keys)
+                layer_dict["Layer"] = count
+                for properties in layer[1:]:
+                    if properties[0] == "type":
+                        layer_dict["Name"] = properties[1]
+                    if properties[0] == "color":
+                        layer_dict["Color"] = properties[1]
+                    if properties[0] == "thickness":
+                        layer_dict["Thickness"] = properties[1]
+                    if properties[0] == "material":
+                        layer_dict["Material"] = properties[1]
+                layers.append(layer_dict)
 
         return layers
 
     def get_revision(self, board_file):
         try:
-            with open(board_file, "r") as file:
-                for line in file:
-                    match = re.search(r'property "VERSION" "([^"]+)"', line)
-                    if match:
-                        version = match.group(1)
-                        return version
+            return get_board_index(board_file).revision
         except Exception as e:
             self.logger.error(str(e))
         return None
@@ -399,31 +426,15 @@ class ProcessManager:
         if stack is None or len(stack) < 1:
             raise RuntimeError("Configure the PCB stack.")
 
-        writer = pd.ExcelWriter(name + ".xlsx")
-        fmt = writer.book.add_format({"font_name": "Calibri", "font_size": "18"})
-        df1 = pd.DataFrame(stack)
-        df1.to_excel(
-            writer,
+        write_table(
+            stack,
+            xlsx_file=name + ".xlsx",
             sheet_name="Stackup",
-            index=False,
             na_rep=" ",
+            width_scale=1.5,
+            font={"font_name": "Calibri", "font_size": "18"},
         )
 
-        for column in df1:
-            column_width = max(df1[column].astype(str).map(len).max(), len(column))
-            col_idx = df1.columns.get_loc(column)
-            writer.sheets["Stackup"].set_column(
-                col_idx, col_idx, column_width * 1.5, fmt
-            )
-
-        writer.close()
-
-    def generate_archive(self, temp_dir, temp_file, project_name):
-        """Generate the files."""
-        temp_file = shutil.make_archive(project_name, "zip", temp_dir)
-        temp_file = shutil.move(temp_file, temp_dir)
-        return temp_file
-
     def _get_lcsc_pn_from_footprint(self, footprint):
         """'Get the MPN/LCSC stock code from standard symbol fields."""
         keys = ["LCSC_Part", "JLCPCB Part"]
@@ -463,7 +474,7 @@ class ProcessManager:
             return footprint.GetFieldText(key)
 
     def _get_rotation_offset_from_footprint(self, footprint) -> float:
-        """Get the rotation from standard symbol fields."""
+        """Get the rotation from standard symbol fields, None if it isn't set."""
         keys = ["JLCPCB Rotation Offset"]
         fallback_keys = ["JlcRotOffset", "JLCRotOffset"]
 
@@ -477,7 +488,7 @@ class ProcessManager:
             self.logger.error(str(e))
 
         if offset is None or offset == "":
-            return 0
+            return None
         else:
             try:
                 return float(offset)
@@ -513,6 +524,20 @@ class ProcessManager:
                     )
                 )
 
+    def _get_placement_origin(self):
+        """Return the origin of the position file, in board coordinates."""
+        if self.placement_origin == "grid":
+            return self.board.GetDesignSettings().GetGridOrigin()
+        if self.placement_origin == "board":
+            # Y grows downwards, the bottom left corner of the outline
+            box = self.board.GetBoardEdgesBoundingBox()
+            return (box.GetLeft(), box.GetBottom())
+        return self.board.GetDesignSettings().GetAuxOrigin()
+
+    def _is_dnp(self, footprint):
+        """Get the do-not-populate attribute, KiCad 7.99 and later."""
+        return bool(footprint.GetAttributes() & getattr(pcbnew, "FP_DNP", 0))
+
     def _normalize_footprint_name(self, footprint):
         # replace footprint names of resistors, capacitors, inductors, diodes, LEDs, fuses etc, with the footprint size only
         pattern = re.compile(r"^(\w*_SMD:)?\w{1,4}_(\d+)_\d+Metric.*$")
@@ -0,0 +1,26 @@
+"""Recolor the black strokes and fills of pdf content streams.
+
+KiCad plots every layer in black, the assembly drawing gives each layer its
+own color by rewriting the "0 0 0 RG" / "0 0 0 rg" operators. The module has
+no dependencies so it can be benchmarked without PyMuPDF.
+"""
+
+import re
+
+# "0 0 0 RG" (stroke) or "0 0 0 rg" (fill) as KiCad writes them. The pattern
+# starts with a literal so the regex engine can jump from candidate to
+# candidate; the lookbehind, only tried on a full match, rejects a zero that
+# ends a longer number such as "10 0 0 rg".
+black_regex = re.compile(rb"0 0 0 (RG|rg)(?!\w)(?<![\w.+-]0 0 0 [Rr][Gg])")
+
+
+def color_operands(color):
+    """Return the 'r g b ' operands for a color given as floats between 0-1."""
+    return bytes(
+        str(color[0]) + " " + str(color[1]) + " " + str(color[2]) + " ", "ascii"
+    )
+
+
+def recolor_stream(stream_bytes, color):
+    """Replace every black RG and rg operator of a content stream in one pass."""
+    return black_regex.sub(color_operands(color) + rb"\1", stream_bytes)
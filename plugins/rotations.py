@@ -0,0 +1,119 @@
+"""Rotation corrections of rotations.cf, matched against footprint names.
+
+All patterns of the file are compiled into one regex per kind of name, the
+short footprint name or, for patterns holding a colon, the name with its
+library. An alternative of the combined regex is tried only after every
+earlier one failed, so the first matching line of the file wins as if the
+lines were searched one by one. Lookups are memoized per footprint, a board
+pays one regex search for each distinct footprint it uses.
+"""
+
+import os
+import re
+from collections import OrderedDict
+
+rotationsFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rotations.cf")
+cacheSize = 4
+
+_cache = OrderedDict()
+
+
+def parse_rotations(text, source="rotations"):
+    """Return the (pattern, rotation) lines of text, in file order."""
+    rules = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        try:
+            if len(parts) != 2:
+                raise ValueError("expected a regex and a rotation")
+            pattern, rotation = parts[0], float(parts[1])
+            # checked as combine() wraps it, where inline flags like (?i) fail
+            combine([pattern])
+        except (ValueError, re.error) as e:
+            raise ValueError("%s line %d: %s" % (source, number, e))
+        rules.append((pattern, rotation))
+    return rules
+
+
+def combine(patterns):
+    """Compile patterns into one regex searched from the start of the name.
+
+    Alternative i is the group ri, the lazy prefix lets an unanchored
+    pattern match anywhere before the next alternative is tried.
+    """
+    if not patterns:
+        return None
+    return re.compile(
+        "|".join(
+            "(?P<r%d>.*?(?:%s))" % (i, pattern) for i, pattern in enumerate(patterns)
+        ),
+        re.DOTALL,
+    )
+
+
+class RotationDatabase:
+    def __init__(self, rules, key=None):
+        self.key = key
+        self.rotations = [rotation for _, rotation in rules]
+        short = []
+        full = []
+        for i, (pattern, _) in enumerate(rules):
+            # the group names count over all rules, whichever regex holds them
+            (full if ":" in pattern else short).append((i, pattern))
+        self.short_regex = self._combine(short)
+        self.full_regex = self._combine(full)
+        self.offsets = {}
+
+    @staticmethod
+    def _combine(rules):
+        regex = combine([pattern for _, pattern in rules])
+        return regex, {"r%d" % n: i for n, (i, _) in enumerate(rules)}
+
+    @staticmethod
+    def _first(regex, name):
+        regex, rules = regex
+        if regex is None:
+            return None
+        match = regex.match(name)
+        if match is None:
+            return None
+        return rules[match.lastgroup]
+
+    def offset(self, library, name):
+        """Return the rotation offset of a footprint, None if no line matches."""
+        full_name = library + ":" + name if library else name
+        try:
+            return self.offsets[full_name]
+        except KeyError:
+            pass
+        matches = [
+            i
+            for i in (
+                self._first(self.short_regex, name),
+                self._first(self.full_regex, full_name),
+            )
+            if i is not None
+        ]
+        offset = self.rotations[min(matches)] if matches else None
+        self.offsets[full_name] = offset
+        return offset
+
+
+def load_rotations(path=rotationsFile):
+    """Return the database of path, read again only if its mtime or size changed."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    database = _cache.get(path)
+    if database is None or database.key != key:
+        with open(path, encoding="utf-8") as f:
+            rules = parse_rotations(f.read(), os.path.basename(path))
+        database = RotationDatabase(rules, key)
+        _cache[path] = database
+        while len(_cache) > cacheSize:
+            _cache.popitem(last=False)
+    _cache.move_to_end(path)
+    return database
@@ -0,0 +1,151 @@
+"""Run the generation stages in the order their inputs and outputs require.
+
+Stages declare the names of what they read and write. A stage starts once
+every stage providing one of its inputs has finished. Stages calling pcbnew
+run one at a time on the calling thread, the others on a thread pool, or
+on the calling thread too without workers. A failed stage does not stop
+the run, only the stages depending on it are skipped.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .tracing import span
+
+stageWorkers = 4
+
+
+class Stage:
+    __slots__ = ("name", "func", "inputs", "outputs", "pcbnew")
+
+    def __init__(self, name, func, inputs, outputs, pcbnew):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.pcbnew = pcbnew
+
+    def __call__(self):
+        with span(self.name, "stage"):
+            return self.func()
+
+
+class Scheduler:
+    def __init__(self, workers=stageWorkers, monitor=None):
+        # 0 runs every stage on the calling thread
+        self.workers = max(0, workers)
+        # a memory.MemoryMonitor measuring every stage
+        self.monitor = monitor
+        self.stages = []
+        self.results = {}
+        self.errors = {}
+        self.skipped = []
+
+    def add(self, name, func, inputs=(), outputs=(), pcbnew=False):
+        """Add the stage name running func(), pcbnew stages stay on this thread."""
+        self.stages.append(Stage(name, func, inputs, outputs, pcbnew))
+
+    def call(self, stage):
+        if self.monitor is None:
+            return stage()
+        with self.monitor.measure(stage.name):
+            return stage()
+
+    def dependencies(self):
+        """Return {stage name: names of the stages providing its inputs}."""
+        providers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in providers:
+                    raise ValueError(
+                        "%s is provided by %s and %s"
+                        % (output, providers[output], stage.name)
+                    )
+                providers[output] = stage.name
+        dependencies = {}
+        for stage in self.stages:
+            missing = [i for i in stage.inputs if i not in providers]
+            if missing:
+                raise ValueError(
+                    "No stage provides %s for %s" % (", ".join(missing), stage.name)
+                )
+            dependencies[stage.name] = {providers[i] for i in stage.inputs}
+        return dependencies
+
+    def run(self, finished=None, released=None):
+        """Run all stages, call finished(name, status) as each one ends.
+
+        status is "done", "failed" or "skipped". released(name) is called
+        once every stage reading the input name has ended. Returns the errors
+        as {stage name: exception}, the skipped stages are in self.skipped.
+        """
+        dependencies = self.dependencies()
+        status = {}
+        pending = list(self.stages)
+        running = {}
+        readers = {}
+        for stage in self.stages:
+            for name in stage.inputs:
+                readers.setdefault(name, set()).add(stage.name)
+
+        def end(stage, state, result=None):
+            status[stage.name] = state
+            for name in set(stage.inputs):
+                readers[name].discard(stage.name)
+                if not readers[name] and released is not None:
+                    released(name)
+            if state == "done":
+                self.results[stage.name] = result
+            elif state == "skipped":
+                self.skipped.append(stage.name)
+            if finished is not None:
+                finished(stage.name, state)
+
+        def collect(futures):
+            for future in futures:
+                stage = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    end(stage, "done", future.result())
+                else:
+                    self.errors[stage.name] = error
+                    end(stage, "failed")
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            while pending or running:
+                collect([future for future in running if future.done()])
+
+                changed = False
+                local = None
+                for stage in list(pending):
+                    states = [status.get(name) for name in dependencies[stage.name]]
+                    if "failed" in states or "skipped" in states:
+                        pending.remove(stage)
+                        end(stage, "skipped")
+                        changed = True
+                    elif all(state == "done" for state in states):
+                        if not stage.pcbnew and self.workers:
+                            pending.remove(stage)
+                            running[executor.submit(self.call, stage)] = stage
+                            changed = True
+                        elif local is None:
+                            local = stage
+
+                if local is not None:
+                    pending.remove(local)
+                    try:
+                        result = self.call(local)
+                    except Exception as e:
+                        self.errors[local.name] = e
+                        end(local, "failed")
+                    else:
+                        end(local, "done", result)
+                elif running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    collect(done)
+                elif pending and not changed:
+                    raise ValueError(
+                        "Stages depend on each other: "
+                        + ", ".join(stage.name for stage in pending)
+                    )
+
+        return self.errors
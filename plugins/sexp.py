@@ -0,0 +1,164 @@
+"""Incremental S-expression reader for KiCad board files.
+
+The reader tokenizes its input chunk by chunk, so a caller interested in a
+single section (e.g. ``setup/stackup``) only pays for the part of the file
+that precedes it and never builds lists for the sections it skips.
+"""
+
+import re
+
+chunkSize = 1 << 20
+
+token_regex = re.compile(rb"""(?x)
+    \s*(?:
+        (?P<brackl>\()|
+        (?P<brackr>\))|
+        (?P<sq>"(?:[^"\\]|\\.)*")|
+        (?P<s>[^()\s"]+)
+       )""")
+number_regex = re.compile(rb"-?\d+(?:\.\d+)?")
+
+
+def iter_tokens(source, chunk_size=chunkSize):
+    """Yield (term, value) pairs from bytes, str or a binary file object."""
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buffer, read, eof = source, None, True
+    else:
+        buffer, read, eof = b"", source.read, False
+
+    pos = 0
+    while True:
+        match = token_regex.match(buffer, pos)
+        # A token touching the end of the buffer may continue in the next chunk
+        if match is None or (not eof and match.end() == len(buffer)):
+            if eof:
+                if buffer[pos:].strip():
+                    raise ValueError("Unexpected data at offset %d" % pos)
+                return
+            chunk = read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        pos = match.end()
+        term = match.lastgroup
+        yield term, match.group(term)
+
+
+def atom(term, value):
+    """Convert a scalar token to int, float or str."""
+    if term == "sq":
+        return value[1:-1].decode("utf-8")
+    if number_regex.fullmatch(value):
+        v = float(value)
+        return int(v) if v.is_integer() else v
+    return value.decode("utf-8")
+
+
+def parse(source):
+    """Parse a whole S-expression into nested lists."""
+    stack = []
+    out = []
+    for term, value in iter_tokens(source):
+        if term == "brackl":
+            stack.append(out)
+            out = []
+        elif term == "brackr":
+            if not stack:
+                raise ValueError("Trouble with nesting of brackets")
+            tmpout, out = out, stack.pop()
+            out.append(tmpout)
+        else:
+            out.append(atom(term, value))
+    if stack or not out:
+        raise ValueError("Trouble with nesting of brackets")
+    return out[0]
+
+
+def iter_sections(source, paths, chunk_size=chunkSize):
+    """Yield (path, node) for every list found at one of the given paths.
+
+    Paths are slash separated heads relative to the root list, so
+    ``"setup/stackup"`` selects ``(kicad_pcb (setup (stackup ...)))``. Only
+    the selected lists are built, everything else is skipped token by token.
+    """
+    targets = {tuple(p.split("/")): p for p in paths}
+    prefixes = {t[:i] for t in targets for i in range(1, len(t))}
+
+    heads = []  # heads of the open lists below the root
+    depth = 0
+    skip_depth = 0
+    expect_head = False
+    node_stack = None
+    node_path = None
+
+    for term, value in iter_tokens(source, chunk_size):
+        if node_stack is not None:
+            if term == "brackl":
+                node_stack.append([])
+            elif term == "brackr":
+                node = node_stack.pop()
+                if node_stack:
+                    node_stack[-1].append(node)
+                else:
+                    node_stack = None
+                    depth -= 1
+                    heads.pop()
+                    yield node_path, node
+            else:
+                node_stack[-1].append(atom(term, value))
+            continue
+
+        if term == "brackl":
+            depth += 1
+            if skip_depth:
+                continue
+            if expect_head:
+                # list without a head symbol
+                heads.append(None)
+                skip_depth = depth - 1
+            expect_head = True
+            continue
+
+        if term == "brackr":
+            depth -= 1
+            if skip_depth:
+                if depth < skip_depth:
+                    skip_depth = 0
+                    heads.pop()
+            elif not expect_head and depth > 0:
+                heads.pop()
+            expect_head = False
+            continue
+
+        if skip_depth or not expect_head:
+            continue
+        expect_head = False
+        if depth == 1:
+            # the root list, e.g. kicad_pcb
+            continue
+        heads.append(atom(term, value))
+        path = tuple(heads)
+        if path in targets:
+            node_stack = [[heads[-1]]]
+            node_path = targets[path]
+        elif path not in prefixes:
+            skip_depth = depth
+
+
+def find_sections(source, paths, chunk_size=chunkSize):
+    """Return {path: node} with the first match of each path.
+
+    Reading stops as soon as every path has been found.
+    """
+    found = {}
+    sections = iter_sections(source, paths, chunk_size)
+    for path, node in sections:
+        found.setdefault(path, node)
+        if len(found) == len(paths):
+            sections.close()
+            break
+    return found
@@ -0,0 +1,38 @@
+"""Stack per-layer KiCad SVG plots into one SVG.
+
+KiCad plots each layer in black, every layer body ends up in its own <g>
+group where black is replaced by currentColor, so the layer color is set
+once through the style of the group.
+"""
+
+import re
+
+svg_open_regex = re.compile(r"<svg\b[^>]*>")
+meta_regex = re.compile(r"\s*<(title|desc)>.*?</\1>", re.S)
+
+
+def read_layer(path):
+    """Return the text up to and including the <svg> tag, and the body."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    match = svg_open_regex.search(text)
+    if match is None:
+        raise ValueError("No <svg> element in " + path)
+    end = text.rfind("</svg>")
+    return text[: match.end()], text[match.end() : end]
+
+
+def composite_svg(layers, output_file):
+    """Write layers, a list of (name, svg file, #rrggbb) bottom first, as one SVG."""
+    with open(output_file, "w", encoding="utf-8") as out:
+        for i, (name, path, color) in enumerate(layers):
+            head, body = read_layer(path)
+            if i == 0:
+                # all layers are plotted with the same page and scale
+                out.write(head)
+                out.write("\n")
+            body = meta_regex.sub("", body).replace("#000000", "currentColor")
+            out.write('<g id="%s" style="color:%s">' % (name, color))
+            out.write(body)
+            out.write("</g>\n")
+        out.write("</svg>\n")
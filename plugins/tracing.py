@@ -0,0 +1,129 @@
+"""Timeline of a run in the Chrome trace format.
+
+The json written by Tracer.save opens in chrome://tracing or ui.perfetto.dev,
+with one row per thread. Every span records its wall time, and the CPU time
+of its thread as the thread duration.
+
+The code being traced calls span(name) of this module, which uses the tracer
+set with set_tracer. Until one is set nothing is recorded and span returns a
+context manager doing nothing.
+"""
+
+import os
+import json
+import time
+import threading
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+nullSpan = NullSpan()
+
+
+class NullTracer:
+    def span(self, name, category="run", **args):
+        return nullSpan
+
+
+class Span:
+    __slots__ = ("tracer", "name", "category", "args", "start", "cpu_start")
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.cpu_start = time.thread_time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        cpu = time.thread_time_ns() - self.cpu_start
+        args = self.args
+        if exc_type is not None:
+            args = dict(args, error=repr(exc))
+        self.tracer.add(self, end, cpu, args)
+        return False
+
+
+class Tracer:
+    """Collect the spans of all threads, in microseconds since the tracer started."""
+
+    def __init__(self):
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.events = []
+        self.threads = {}
+        self.lock = threading.Lock()
+
+    def span(self, name, category="run", **args):
+        return Span(self, name, category, args)
+
+    def add(self, span, end, cpu, args):
+        thread = threading.current_thread()
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": (span.start - self.origin) / 1000,
+            "dur": (end - span.start) / 1000,
+            "tts": span.cpu_start / 1000,
+            "tdur": cpu / 1000,
+            "pid": self.pid,
+            "tid": thread.ident,
+            "args": args,
+        }
+        with self.lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append(event)
+
+    def trace_events(self):
+        with self.lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        for tid, name in threads.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self.pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+            )
+        return events
+
+    def save(self, trace_file):
+        temp_file = trace_file + ".part"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": self.trace_events(), "displayTimeUnit": "ms"},
+                f,
+                default=str,
+            )
+        os.replace(temp_file, trace_file)
+
+
+_tracer = NullTracer()
+
+
+def set_tracer(tracer):
+    """Record the spans with tracer from now on, None stops recording."""
+    global _tracer
+    _tracer = tracer if tracer is not None else NullTracer()
+
+
+def span(name, category="run", **args):
+    """Return a context manager recording name as a span of the current tracer."""
+    return _tracer.span(name, category, **args)